@@ -0,0 +1,133 @@
+"""Запуск WSGI-приложения Django под ASGI-сервером.
+
+Django 2.2 не умеет ASGI и асинхронные представления, а перейти на 3.x
+проект пока не может. Адаптер выполняет представление в пуле потоков,
+а чтение тела запроса, отдачу ответа по частям и медленных клиентов
+обслуживает цикл событий сервера: поток занят только, пока работает
+Django.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+QUEUE_SIZE = 8
+
+
+class WsgiToAsgi:
+    def __init__(self, wsgi_application, max_workers=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = io.BytesIO()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        loop = asyncio.get_running_loop()
+        # Очередь ограничена: поток не обгоняет медленного клиента.
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        worker = loop.run_in_executor(
+            self.executor, self.run, environ_from_scope(scope, body),
+            lambda item: asyncio.run_coroutine_threadsafe(
+                queue.put(item), loop).result())
+        error = None
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            if error is None:
+                try:
+                    await send(message)
+                except Exception as exc:
+                    # Клиент ушёл: дочитываем очередь, чтобы поток
+                    # не завис на put(), и отдаём ошибку серверу.
+                    error = exc
+        await worker
+        if error is not None:
+            raise error
+
+    def run(self, environ, put):
+        """Весь запрос в одном потоке: соединения с базой — его."""
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started.append({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin1'),
+                             value.encode('latin1'))
+                            for name, value in headers],
+            })
+
+        chunks = None
+        try:
+            chunks = self.wsgi_application(environ, start_response)
+            put(started[0])
+            for chunk in chunks:
+                if chunk:
+                    put({'type': 'http.response.body', 'body': chunk,
+                         'more_body': True})
+            put({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                # close() шлёт request_finished и закрывает соединения.
+                close()
+            put(None)
+
+
+def environ_from_scope(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
@@ -0,0 +1,18 @@
+from django.db.backends.sqlite3 import base
+
+from core.db.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """SQLite с настройками PRAGMAS и пулом для файловой базы."""
+
+    @property
+    def pool(self):
+        # Закрытие базы в памяти её удаляет, такую базу пул не держит.
+        return None if self.is_in_memory_db() else super().pool
+
+    def open_connection(self, conn_params):
+        conn = super().open_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
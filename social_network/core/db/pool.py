@@ -0,0 +1,158 @@
+"""Пул соединений с базой внутри процесса.
+
+Django 2.2 держит по соединению на поток (CONN_MAX_AGE) и не ограничивает
+их число. С настройкой POOL в DATABASES соединение в конце запроса
+возвращается в пул и достаётся следующему потоку; потоков больше
+MAX_SIZE ждут свободное соединение не дольше TIMEOUT секунд.
+Соединение, простоявшее дольше CHECK_AFTER секунд, перед выдачей
+проверяется запросом SELECT 1, дольше MAX_IDLE — закрывается.
+"""
+import functools
+import time
+
+from django.db import OperationalError
+
+from core import metrics, pools
+
+
+POOL_CONNECTIONS = metrics.counter(
+    'db_pool_connections_total',
+    'Выдачи соединений пулом: reused, opened; discarded — закрытые.',
+    ['alias', 'result'])
+POOL_WAIT = metrics.histogram(
+    'db_pool_wait_seconds', 'Ожидание свободного соединения в пуле.',
+    ['alias'])
+
+
+class Pool(pools.Pool):
+    """Соединения DB-API одной базы.
+
+    В idle пары (соединение, время возврата); выдаётся последнее
+    вернувшееся, старые остаются в начале и закрываются.
+    """
+
+    def __init__(self, alias, max_size=10, timeout=5, check_after=30,
+                 max_idle=600):
+        super().__init__(max_size, timeout)
+        self.alias = alias
+        self.check_after = check_after
+        self.max_idle = max_idle
+
+    def acquire(self, connect):
+        started = time.perf_counter()
+        if not self.reserve():
+            raise OperationalError(
+                f'Все {self.max_size} соединений с базой {self.alias} '
+                f'заняты дольше {self.timeout} с')
+        POOL_WAIT.observe(time.perf_counter() - started, alias=self.alias)
+        try:
+            conn = self._take()
+            if conn is None:
+                conn = connect()
+                POOL_CONNECTIONS.inc(alias=self.alias, result='opened')
+            else:
+                POOL_CONNECTIONS.inc(alias=self.alias, result='reused')
+            return conn
+        except BaseException:
+            self.unreserve()
+            raise
+
+    def _take(self):
+        while True:
+            entry = self.take_idle()
+            if entry is None:
+                return None
+            conn, released = entry
+            idle = time.monotonic() - released
+            if idle < self.check_after or (idle < self.max_idle
+                                           and usable(conn)):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn, reusable=True):
+        try:
+            if not reusable:
+                self._discard(conn)
+                return
+            now = time.monotonic()
+            with self.lock:
+                self.idle.append((conn, now))
+                stale = 0
+                while (stale < len(self.idle)
+                       and now - self.idle[stale][1] > self.max_idle):
+                    stale += 1
+                expired, self.idle[:stale] = self.idle[:stale], []
+            for conn, released in expired:
+                self._discard(conn)
+        finally:
+            self.unreserve()
+
+    def _discard(self, conn):
+        POOL_CONNECTIONS.inc(alias=self.alias, result='discarded')
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def disconnect(self):
+        for conn, released in self.drain():
+            self._discard(conn)
+
+
+def usable(conn):
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+    except Exception:
+        return False
+    return True
+
+
+_pools = pools.Registry()
+
+
+def get_pool(alias, settings_dict):
+    key = (alias, settings_dict['NAME'], settings_dict.get('HOST'),
+           settings_dict.get('PORT'))
+    return _pools.get(key, lambda: Pool(alias, **{
+        name.lower(): value
+        for name, value in settings_dict['POOL'].items()}))
+
+
+class PooledDatabaseWrapperMixin:
+    """Соединения из пула, если в настройках базы задан POOL."""
+
+    @property
+    def pool(self):
+        if self.settings_dict.get('POOL') is None:
+            return None
+        return get_pool(self.alias, self.settings_dict)
+
+    def open_connection(self, conn_params):
+        return super().get_new_connection(conn_params)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return self.open_connection(conn_params)
+        return pool.acquire(functools.partial(self.open_connection,
+                                              conn_params))
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        pool.release(self.connection, self._reusable())
+
+    def _reusable(self):
+        if self.errors_occurred:
+            return False
+        try:
+            # Незавершённая транзакция не переходит к другому потоку.
+            self.connection.rollback()
+        except Exception:
+            return False
+        return True
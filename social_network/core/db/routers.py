@@ -0,0 +1,45 @@
+"""Чтение с реплик, запись — в основную базу.
+
+После записи поток до конца запроса читает из основной базы: реплика
+может отставать, а пользователь должен сразу увидеть свой пост.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import receiver
+
+
+_local = threading.local()
+
+
+def pinned():
+    return (getattr(_local, 'pinned', False)
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block)
+
+
+@receiver(request_started)
+@receiver(request_finished)
+def unpin(**kwargs):
+    _local.pinned = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        if not replicas or pinned():
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _local.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же строки, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in getattr(settings, 'DATABASE_REPLICAS', ())
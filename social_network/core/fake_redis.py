@@ -0,0 +1,192 @@
+"""Сервер с протоколом Redis внутри процесса — для тестов и разработки.
+
+Понимает только команды, которые нужны RedisCache. Запускается на
+свободном порту в отдельном потоке:
+
+    with FakeRedisServer() as server:
+        CACHES['default']['LOCATION'] = server.location
+"""
+import socketserver
+import threading
+import time
+
+from .redis_cache import encode_command
+
+
+class Store:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+        self.commands = 0
+
+    def _alive(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _expire(self, key, ms):
+        self.expires[key] = time.monotonic() + int(ms) / 1000
+
+    def execute(self, name, args):
+        handler = getattr(self, f'cmd_{name.decode().lower()}', None)
+        if handler is None:
+            return Error(f'ERR unknown command {name.decode()!r}')
+        with self.lock:
+            self.commands += 1
+            try:
+                return handler(*args)
+            except TypeError:
+                return Error('ERR wrong number of arguments')
+
+    def cmd_ping(self):
+        return Status('PONG')
+
+    def cmd_select(self, db):
+        return Status('OK')
+
+    def cmd_get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        exists = self._alive(key)
+        if b'NX' in options and exists:
+            return None
+        if b'XX' in options and not exists:
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b'PX' in options:
+            self._expire(key, options[options.index(b'PX') + 1])
+        if b'EX' in options:
+            self._expire(key, int(options[options.index(b'EX') + 1]) * 1000)
+        return Status('OK')
+
+    def cmd_del(self, *keys):
+        deleted = [key for key in keys if self._alive(key)]
+        for key in deleted:
+            del self.data[key]
+            self.expires.pop(key, None)
+        return len(deleted)
+
+    def cmd_exists(self, *keys):
+        return sum(self._alive(key) for key in keys)
+
+    def cmd_incrby(self, key, delta):
+        try:
+            value = int(self.data[key]) if self._alive(key) else 0
+        except ValueError:
+            return Error('ERR value is not an integer or out of range')
+        value += int(delta)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_pexpire(self, key, ms):
+        if not self._alive(key):
+            return 0
+        self._expire(key, ms)
+        return 1
+
+    def cmd_persist(self, key):
+        if not self._alive(key):
+            return 0
+        return int(self.expires.pop(key, None) is not None)
+
+    def cmd_flushdb(self):
+        self.data.clear()
+        self.expires.clear()
+        return Status('OK')
+
+    def cmd_dbsize(self):
+        return sum(self._alive(key) for key in list(self.data))
+
+
+class Status(str):
+    pass
+
+
+class Error(str):
+    pass
+
+
+def encode_reply(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, Status):
+        return b'+%s\r\n' % reply.encode()
+    if isinstance(reply, Error):
+        return b'-%s\r\n' % reply.encode()
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, list):
+        return (b'*%d\r\n' % len(reply)
+                + b''.join(encode_reply(item) for item in reply))
+    return encode_command(reply)[4:]
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        authenticated = self.server.password is None
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            if command[0].upper() == b'AUTH':
+                authenticated = (command[-1].decode()
+                                 == self.server.password)
+                reply = (Status('OK') if authenticated
+                         else Error('WRONGPASS invalid password'))
+            elif not authenticated:
+                reply = Error('NOAUTH Authentication required.')
+            else:
+                reply = self.server.store.execute(command[0], command[1:])
+            self.wfile.write(encode_reply(reply))
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line.startswith(b'*'):
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, password=None):
+        super().__init__((host, port), Handler)
+        self.store = Store()
+        self.password = password
+        self.thread = None
+
+    @property
+    def location(self):
+        host, port = self.server_address
+        auth = '' if self.password is None else f':{self.password}@'
+        return f'redis://{auth}{host}:{port}/0'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
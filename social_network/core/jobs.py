@@ -0,0 +1,189 @@
+"""Очередь фоновых задач в таблице базы данных.
+
+Задача — функция, зарегистрированная декоратором task под именем, с
+аргументами, которые сериализуются в JSON. defer() ставит задачу после
+коммита транзакции, manage.py runworker выполняет. Задачи выполняются
+хотя бы один раз, поэтому должны быть идемпотентными; ключ key не даёт
+поставить одну и ту же задачу повторно.
+
+С JOBS_EAGER = True (разработка, тесты) задача выполняется сразу в
+вызывающем потоке и таблица не используется.
+
+Воркер забирает задачу условным UPDATE: это работает и в SQLite, где
+нет SELECT … FOR UPDATE SKIP LOCKED. Задача упавшего воркера снова
+становится доступной через JOBS_LEASE секунд.
+"""
+import json
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import metrics
+from .models import Job
+from .utils import setting
+
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+JOB_RUNS = metrics.counter(
+    'jobs_total', 'Выполнения задач: done, retry, failed.', ['name', 'result'])
+JOB_LAG = metrics.histogram(
+    'jobs_lag_seconds', 'Сколько задача ждала воркера после run_at.',
+    ['name'])
+JOB_DURATION = metrics.histogram(
+    'jobs_duration_seconds', 'Время выполнения задачи.', ['name'])
+
+
+def task(name):
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def eager():
+    return setting('JOBS_EAGER', False)
+
+
+def enqueue(name, *args, key=None, delay=0, max_attempts=None):
+    """Записывает задачу в очередь; с занятым ключом ничего не делает."""
+    if name not in TASKS:
+        raise KeyError(f'Неизвестная задача {name}')
+    job = Job(name=name, args=json.dumps(args), key=key,
+              run_at=timezone.now() + timedelta(seconds=delay),
+              max_attempts=max_attempts or setting('JOBS_MAX_ATTEMPTS', 5))
+    if key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return None
+    return job
+
+
+def defer(name, *args, key=None):
+    """Задача после коммита текущей транзакции или сразу в режиме eager."""
+    if eager():
+        try:
+            # Точка сохранения: ошибка задачи откатывает только её
+            # изменения, а транзакция запроса остаётся рабочей (в
+            # PostgreSQL ошибочный запрос иначе прерывает её целиком).
+            with transaction.atomic():
+                TASKS[name](*args)
+        except Exception:
+            # Побочный эффект не должен ронять запрос, как и в воркере.
+            logger.exception('Задача %s%r не выполнена', name, args)
+        return
+    transaction.on_commit(lambda: enqueue(name, *args, key=key))
+
+
+def claim(limit=1):
+    """Забирает до limit готовых задач, которые никто не выполняет."""
+    now = timezone.now()
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    candidates = list(Job.objects.filter(free, status=Job.PENDING,
+                                         run_at__lte=now)
+                      .order_by('run_at', 'pk')
+                      .values_list('pk', flat=True)[:limit])
+    lease = now + timedelta(seconds=setting('JOBS_LEASE', 300))
+    claimed = []
+    for pk in candidates:
+        # Другой воркер мог забрать задачу между выборкой и UPDATE.
+        if Job.objects.filter(free, pk=pk, status=Job.PENDING).update(
+                locked_until=lease, attempts=F('attempts') + 1):
+            claimed.append(pk)
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_at', 'pk'))
+
+
+def execute(job):
+    """Выполняет забранную задачу и записывает результат."""
+    JOB_LAG.observe((timezone.now() - job.run_at).total_seconds(),
+                    name=job.name)
+    started = time.perf_counter()
+    try:
+        TASKS[job.name](*json.loads(job.args))
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Задача %s #%s не выполнена', job.name, job.pk)
+        if job.attempts >= job.max_attempts:
+            result, changes = 'failed', {'status': Job.FAILED}
+        else:
+            # Экспоненциальная пауза: 2, 4, 8… секунд, не больше часа.
+            delay = min(2 ** job.attempts, 3600)
+            result, changes = 'retry', {
+                'run_at': timezone.now() + timedelta(seconds=delay)}
+        Job.objects.filter(pk=job.pk).update(locked_until=None,
+                                             last_error=error, **changes)
+    else:
+        result = 'done'
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.DONE, locked_until=None, finished_at=timezone.now())
+    JOB_DURATION.observe(time.perf_counter() - started, name=job.name)
+    JOB_RUNS.inc(name=job.name, result=result)
+    return result == 'done'
+
+
+def work_off(limit=None):
+    """Выполняет готовые задачи, пока они есть; число выполненных."""
+    count = 0
+    while limit is None or count < limit:
+        jobs = claim()
+        if not jobs:
+            break
+        execute(jobs[0])
+        count += 1
+    return count
+
+
+def purge(older_than):
+    """Удаляет выполненные задачи; их ключи снова можно использовать."""
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE,
+        finished_at__lt=timezone.now() - timedelta(seconds=older_than),
+    ).delete()
+    return deleted
+
+
+class Worker:
+    """Потоки, каждый из которых по очереди забирает и выполняет задачи."""
+
+    def __init__(self, threads=4, poll_interval=1.0):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.stopping = threading.Event()
+
+    def loop(self):
+        while not self.stopping.is_set():
+            close_old_connections()
+            try:
+                jobs = claim()
+                for job in jobs:
+                    execute(job)
+            except Exception:
+                # Например, база недоступна: ждём и пробуем снова.
+                logger.exception('Ошибка воркера')
+                jobs = []
+            if not jobs:
+                self.stopping.wait(self.poll_interval)
+        close_old_connections()
+
+    def run(self):
+        workers = [threading.Thread(target=self.loop, name=f'jobs-{number}')
+                   for number in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+    def stop(self, *args):
+        self.stopping.set()
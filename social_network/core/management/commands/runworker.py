@@ -0,0 +1,63 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди core.jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4,
+                            help='Потоков в каждом процессе.')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Процессов воркера.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Пауза в секундах, когда задач нет.')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти.')
+        parser.add_argument('--purge-after', type=int, default=7 * 86400,
+                            help='Удалить выполненные задачи старше, '
+                                 'секунд.')
+
+    def handle(self, *args, **options):
+        purged = jobs.purge(options['purge_after'])
+        if purged:
+            self.stderr.write(f'Удалено выполненных задач: {purged}')
+        if options['once']:
+            done = jobs.work_off()
+            self.stdout.write(self.style.SUCCESS(
+                f'Выполнено задач: {done}'))
+            return
+        if options['processes'] == 1:
+            self.work(options['threads'], options['poll_interval'])
+            return
+        # Соединения родителя не должны достаться детям после fork.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [context.Process(target=self.work,
+                                    args=(options['threads'],
+                                          options['poll_interval']))
+                    for _ in range(options['processes'])]
+        for child in children:
+            child.start()
+
+        def stop(*args):
+            # Дети дорабатывают текущие задачи и выходят.
+            for child in children:
+                child.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for child in children:
+            child.join()
+
+    def work(self, threads, poll_interval):
+        worker = jobs.Worker(threads, poll_interval)
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stderr.write(f'Воркер: потоков {threads}')
+        worker.run()
@@ -0,0 +1,178 @@
+"""Метрики процесса в текстовом формате Prometheus.
+
+Счётчики и гистограммы пишутся без блокировок: у каждого потока свой
+набор значений, а /metrics складывает их при чтении. Блокировка нужна
+только один раз, когда поток впервые пишет в метрику, и когда набор
+завершившегося потока переносится в общий итог.
+"""
+import bisect
+import threading
+import weakref
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = {}
+        # Итог потоков, которые уже завершились.
+        self._retired = {}
+        # Сборщик мусора может вызвать _retire в потоке, который уже
+        # держит блокировку.
+        self._lock = threading.RLock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'values', None)
+        if shard is None:
+            shard = self._local.values = {}
+            with self._lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(threading.current_thread(), self._retire,
+                             shard)
+        return shard
+
+    def _retire(self, shard):
+        # Потоки пула и потоки на запрос приходят и уходят: без переноса
+        # их наборы копились бы, замедляя каждое чтение.
+        with self._lock:
+            del self._shards[id(shard)]
+            self._add(self._retired, shard)
+
+    def _add(self, merged, shard):
+        for key, value in list(shard.items()):
+            merged[key] = self._merge(merged.get(key), value)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=''):
+        pairs = [f'{name}="{escape(value)}"'
+                 for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def collect(self):
+        """Сумма значений всех потоков по наборам меток."""
+        merged = {}
+        with self._lock:
+            self._add(merged, self._retired)
+            shards = list(self._shards.values())
+        for shard in shards:
+            self._add(merged, shard)
+        return merged
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        for key, value in sorted(self.collect().items()):
+            lines.extend(self._samples(key, value))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.collect().get(self._key(labels), 0)
+
+    @staticmethod
+    def _merge(total, value):
+        return (total or 0) + value
+
+    def _samples(self, key, value):
+        return [f'{self.name}{self._labels(key)} {format_value(value)}']
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            # Счётчики корзин (последняя — +Inf), сумма, количество.
+            state = shard[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def count(self, **labels):
+        state = self.collect().get(self._key(labels))
+        return state[2] if state else 0
+
+    @staticmethod
+    def _merge(total, value):
+        if total is None:
+            return [list(value[0]), value[1], value[2]]
+        return [[a + b for a, b in zip(total[0], value[0])],
+                total[1] + value[1], total[2] + value[2]]
+
+    def _samples(self, key, value):
+        samples = []
+        cumulative = 0
+        bounds = [format_value(bound) for bound in self.buckets] + ['+Inf']
+        for bound, count in zip(bounds, value[0]):
+            cumulative += count
+            labels = self._labels(key, f'le="{bound}"')
+            samples.append(f'{self.name}_bucket{labels} {cumulative}')
+        samples.append(f'{self.name}_sum{self._labels(key)} '
+                       f'{format_value(value[1])}')
+        samples.append(f'{self.name}_count{self._labels(key)} {value[2]}')
+        return samples
+
+
+def escape(value):
+    return (value.replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        # Повторная регистрация (перезагрузка модуля) отдаёт ту же метрику.
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames,
+                                       buckets))
@@ -0,0 +1,220 @@
+"""Метрики и профилирование запросов: SQL, шаблоны и кэш.
+
+MetricsMiddleware считает время ответа и число SQL-запросов каждого
+представления для /metrics, по всем базам, включая реплики.
+
+Для доли запросов PROFILING_SAMPLE_RATE (0 — выключено) middleware
+собирает число и время SQL-запросов, повторы одинаковых запросов,
+время рендера каждого шаблона и попадания в кэш. Итог уходит в
+заголовок Server-Timing и одной JSON-строкой в лог core.profiling.
+Время шаблонов включает SQL ленивых выборок, которые они вычисляют.
+Обёртка Template.render ставится только на время профилируемых
+запросов; с нулевой долей middleware не подключается вовсе.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+from . import metrics
+
+
+logger = logging.getLogger('core.profiling')
+
+_local = threading.local()
+_MISSING = object()
+_original_render = Template.render
+# Сколько профилируемых запросов сейчас идёт во всех потоках.
+_timed_requests = 0
+_timed_lock = threading.Lock()
+
+REQUEST_LATENCY = metrics.histogram(
+    'http_request_duration_seconds', 'Время ответа по имени адреса.',
+    ['view', 'method'])
+REQUEST_QUERIES = metrics.histogram(
+    'http_request_sql_queries', 'SQL-запросов на запрос по имени адреса.',
+    ['view'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+
+
+class Profile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = Counter()
+        self.sql_time = 0.0
+        self.templates = defaultdict(float)
+        self.template_time = 0.0
+        self.depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries[(sql, repr(params))] += 1
+
+    def summary(self, request, response):
+        total = time.perf_counter() - self.started
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_count': sum(self.queries.values()),
+            'sql_duplicates': sum(count - 1
+                                  for count in self.queries.values()),
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'templates': {name: round(elapsed * 1000, 2)
+                          for name, elapsed in self.templates.items()},
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+def _timed_render(self, context, *args, **kwargs):
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return _original_render(self, context, *args, **kwargs)
+    profile.depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, *args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - started
+        profile.depth -= 1
+        profile.templates[self.name or '<string>'] += elapsed
+        if not profile.depth:
+            profile.template_time += elapsed
+
+
+def _start_timing():
+    global _timed_requests
+    with _timed_lock:
+        if not _timed_requests:
+            Template.render = _timed_render
+        _timed_requests += 1
+
+
+def _stop_timing():
+    global _timed_requests
+    with _timed_lock:
+        _timed_requests -= 1
+        if not _timed_requests:
+            Template.render = _original_render
+
+
+def _counting(profile, cache):
+    """Обёртки get/get_many экземпляра кэша, считающие попадания."""
+    get, get_many = cache.get, cache.get_many
+
+    def counted_get(key, default=None, version=None):
+        value = get(key, _MISSING, version=version)
+        if value is _MISSING:
+            profile.cache_misses += 1
+            return default
+        profile.cache_hits += 1
+        return value
+
+    def counted_get_many(keys, version=None):
+        keys = list(keys)
+        found = get_many(keys, version=version)
+        profile.cache_hits += len(found)
+        profile.cache_misses += len(keys) - len(found)
+        return found
+
+    return {'get': counted_get, 'get_many': counted_get_many}
+
+
+def server_timing(summary):
+    entries = [
+        f'total;dur={summary["total_ms"]}',
+        f'sql;dur={summary["sql_ms"]};desc="{summary["sql_count"]} queries, '
+        f'{summary["sql_duplicates"]} duplicates"',
+        f'tpl;dur={summary["template_ms"]}',
+        f'cache;desc="{summary["cache_hits"]} hits, '
+        f'{summary["cache_misses"]} misses"',
+    ]
+    for number, (name, elapsed) in enumerate(
+            sorted(summary['templates'].items(), key=lambda item: -item[1])):
+        entries.append(f'tpl{number};dur={elapsed};desc="{name}"')
+    return ', '.join(entries)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not self.rate():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    @staticmethod
+    def rate():
+        return getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+
+    def sampled(self):
+        return random.random() < self.rate()
+
+    def __call__(self, request):
+        if not self.sampled():
+            return self.get_response(request)
+        profile = _local.profile = Profile()
+        patched = []
+        # Пока обёртка стоит, в других потоках она стоит одной проверки
+        # thread-local.
+        _start_timing()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(
+                        profile.record_query))
+                for alias in settings.CACHES:
+                    cache = caches[alias]
+                    for name, method in _counting(profile, cache).items():
+                        setattr(cache, name, method)
+                    patched.append(cache)
+                response = self.get_response(request)
+        finally:
+            _stop_timing()
+            _local.profile = None
+            for cache in patched:
+                del cache.get, cache.get_many
+        summary = profile.summary(request, response)
+        response['Server-Timing'] = server_timing(summary)
+        logger.info(json.dumps(summary, ensure_ascii=False))
+        return response
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        REQUEST_LATENCY.observe(time.perf_counter() - started, view=view,
+                                method=request.method)
+        REQUEST_QUERIES.observe(queries[0], view=view)
+        return response
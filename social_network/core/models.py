@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class CreatedModel(models.Model):
@@ -6,3 +7,50 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class UpdatedModel(models.Model):
+    # Меняется при каждом save(); записи, изменённые через update(),
+    # обновляют его явно.
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class Job(models.Model):
+    """Задача очереди core.jobs."""
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=100)
+    args = models.TextField('Аргументы в JSON', default='[]')
+    key = models.CharField('Ключ идемпотентности', max_length=200,
+                           unique=True, null=True, blank=True)
+    status = models.CharField('Состояние', max_length=10, choices=STATUSES,
+                              default=PENDING)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Предел попыток',
+                                                    default=5)
+    run_at = models.DateTimeField('Выполнить после', default=timezone.now)
+    locked_until = models.DateTimeField('Занята до', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    finished_at = models.DateTimeField('Выполнена', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,114 @@
+import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils import timezone
+
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# Наибольшее целое в SQLite и bigint в PostgreSQL: больший id или OFFSET
+# база не примет.
+MAX_INT = 2 ** 63 - 1
+
+
+def encode_cursor(value, pk):
+    """Кодирует ключ (дата, id) в строку для адреса страницы."""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, datetime.timezone.utc)
+    delta = value - EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 10 ** 6
+    return f'{micros + delta.microseconds}.{pk}'
+
+
+def decode_cursor(cursor):
+    """Обратное преобразование; для битого курсора возвращает None."""
+    try:
+        micros, pk = cursor.split('.')
+        value = EPOCH + datetime.timedelta(microseconds=int(micros))
+        pk = int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+    if not 0 <= pk <= MAX_INT:
+        return None
+    return value, pk
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (field, id) вместо OFFSET.
+
+    Следующая страница выбирается условием «ключ меньше последнего
+    показанного», поэтому глубокие страницы стоят столько же, сколько
+    первая, а COUNT(*) по всей ленте не выполняется. Номер страницы
+    без курсора (старые ссылки ?page=N) обслуживается через OFFSET.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 tiebreak='pk'):
+        super().__init__(object_list, per_page)
+        self.field = field
+        # Колонка, по которой сравнивается pk объекта при равных датах.
+        self.tiebreak = tiebreak
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        # Известно только, есть ли страница после текущей.
+        return self._num_pages
+
+    def cursor_for(self, obj):
+        return encode_cursor(getattr(obj, self.field), obj.pk)
+
+    def _ordered(self, descending=True):
+        sign = '-' if descending else ''
+        return self.object_list.order_by(f'{sign}{self.field}',
+                                         f'{sign}{self.tiebreak}')
+
+    def _seek(self, cursor, older):
+        value, pk = cursor
+        lookup = 'lt' if older else 'gt'
+        # field <= value AND (field < value OR tiebreak < pk): первое
+        # условие даёт базе диапазон по индексу, второе отсекает дубли.
+        return self._ordered(descending=older).filter(
+            Q(**{f'{self.field}__{lookup}e': value}),
+            Q(**{f'{self.field}__{lookup}': value})
+            | Q(**{f'{self.tiebreak}__{lookup}': pk})
+        )
+
+    def get_page(self, number=None, after=None, before=None):
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        if number * self.per_page + 1 > MAX_INT:
+            # Такой страницы заведомо нет, как и любой за концом ленты.
+            number = 1
+        after = decode_cursor(after)
+        before = decode_cursor(before)
+        limit = self.per_page + 1
+        if after is not None:
+            rows = list(self._seek(after, older=True)[:limit])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            number = max(number, 2)
+        elif before is not None:
+            rows = list(self._seek(before, older=False)[:limit])
+            if len(rows) <= self.per_page:
+                number = 1
+            rows = rows[:self.per_page][::-1]
+            has_next = True
+        else:
+            offset = (number - 1) * self.per_page
+            rows = list(self._ordered()[offset:offset + limit])
+            if not rows and number > 1:
+                number = 1
+                rows = list(self._ordered()[:limit])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+        self._num_pages = number + 1 if has_next else number
+        self.next_cursor = (self.cursor_for(rows[-1])
+                            if has_next and rows else None)
+        self.previous_cursor = (self.cursor_for(rows[0])
+                                if number > 1 and rows else None)
+        return self._get_page(rows, number, self)
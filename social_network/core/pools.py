@@ -0,0 +1,54 @@
+"""Основа пулов соединений с базой и с кэшем.
+
+Пул ограничивает число соединений процесса и хранит свободные для
+следующего потока. Пулы живут в Registry по ключу настроек и
+принадлежат процессу, который их создал: после fork соединения
+родителя не используются.
+"""
+import os
+import threading
+
+
+class Pool:
+    def __init__(self, max_size, timeout=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.idle = []
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def reserve(self):
+        """Место под соединение; False, если за timeout не освободилось."""
+        return self.slots.acquire(timeout=self.timeout)
+
+    def unreserve(self):
+        self.slots.release()
+
+    def take_idle(self):
+        with self.lock:
+            return self.idle.pop() if self.idle else None
+
+    def put_idle(self, item):
+        with self.lock:
+            self.idle.append(item)
+
+    def drain(self):
+        """Забирает все свободные соединения, чтобы закрыть их."""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        return idle
+
+
+class Registry:
+    def __init__(self):
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, factory):
+        """Пул по ключу; в новом процессе создаётся заново."""
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is None or pool.pid != os.getpid():
+                pool = self.pools[key] = factory()
+        return pool
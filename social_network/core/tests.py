@@ -1,5 +1,45 @@
-from django.test import TestCase
+import asyncio
+import gc
+import io
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.signals import request_finished, request_started
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError, connection, transaction
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.template.base import Template
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from core.asgi import WsgiToAsgi, environ_from_scope
+from core import jobs
+from core.db import config
+from core.db.pool import Pool
+from core.db.routers import ReplicaRouter
+from core.fake_redis import FakeRedisServer
+from core.redis_cache import RedisCache, RedisError
+from core.metrics import Counter, Histogram
+from core import middleware
+from core.middleware import Profile, ProfilingMiddleware
+from core.models import Job
+from posts.models import Post
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -9,3 +49,503 @@ class ViewTestClass(TestCase):
         # Проверьте, что используется шаблон core/404.html
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class RedisCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeRedisServer().start()
+        cls.override = override_settings(CACHES={'default': {
+            'BACKEND': 'core.redis_cache.RedisCache',
+            'LOCATION': cls.server.location,
+            'OPTIONS': {'MAX_CONNECTIONS': 2, 'SOCKET_TIMEOUT': 1},
+        }})
+        cls.override.enable()
+        cls.pool = caches['default'].pool
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.override.disable()
+        cls.pool.disconnect()
+        cls.server.stop()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_basic_operations(self):
+        cache.set('post', {'text': 'Текст'})
+        self.assertEqual(cache.get('post'), {'text': 'Текст'})
+        self.assertIsNone(cache.get('missing'))
+        self.assertFalse(cache.add('post', 'другое'))
+        self.assertTrue(cache.add('new', 1))
+        self.assertEqual(cache.incr('new', 4), 5)
+        self.assertEqual(cache.get('new'), 5)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.delete('post')
+        self.assertFalse(cache.has_key('post'))
+        cache.set('gone', 1, 0)
+        self.assertIsNone(cache.get('gone'))
+        cache.set('short', 1, 0.05)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('short'))
+        cache.set('forever', 1, None)
+        self.assertTrue(cache.touch('forever', 10))
+
+    def test_many_keys_are_pipelined(self):
+        """get_many и set_many — один обмен с сервером на всю страницу."""
+        data = {f'key{i}': i for i in range(50)}
+        commands = self.server.store.commands
+        cache.set_many(data)
+        self.assertEqual(cache.get_many(list(data) + ['missing']), data)
+        self.assertEqual(self.server.store.commands - commands, 51)
+        cache.delete_many(data)
+        self.assertEqual(cache.get_many(data), {})
+
+    def test_pool_is_shared_by_threads(self):
+        def work(number):
+            caches['default'].set(f'thread{number}', number)
+            return caches['default'].get(f'thread{number}')
+
+        with ThreadPoolExecutor(8) as pool:
+            self.assertEqual(list(pool.map(work, range(40))),
+                             list(range(40)))
+        self.assertLessEqual(len(cache.pool.idle), 2)
+
+    def test_password_from_url(self):
+        server = FakeRedisServer(password='p@ss').start()
+        try:
+            location = server.location.replace('p@ss', 'p%40ss')
+            secured = RedisCache(location, {})
+            secured.set('key', 'value')
+            self.assertEqual(secured.get('key'), 'value')
+            # Неверный пароль — ошибка настройки, а не сбой связи.
+            wrong = RedisCache(location.replace('p%40ss', 'wrong'), {})
+            with self.assertRaises(RedisError):
+                wrong.get('key')
+            secured.pool.disconnect()
+        finally:
+            server.stop()
+
+    def test_server_down_is_a_miss(self):
+        """Без сервера чтение — промах, запись пропускается."""
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            host, port = sock.getsockname()
+        down = RedisCache(f'redis://{host}:{port}/0',
+                          {'OPTIONS': {'SOCKET_TIMEOUT': 0.1}})
+        with self.assertLogs('core.redis_cache', 'WARNING'):
+            self.assertEqual(down.get('key', 'default'), 'default')
+            down.set('key', 1)
+            self.assertEqual(down.get_many(['key']), {})
+            self.assertEqual(down.set_many({'key': 1}), ['key'])
+            self.assertFalse(down.add('key', 1))
+
+    def test_post_fragments_use_shared_cache(self):
+        user = User.objects.create_user(username='author')
+        Post.objects.create(author=user, text='Пост в общем кэше')
+        self.client.get(reverse('posts:index'))
+        self.assertTrue(any(key.startswith(b':1:post_fragment:')
+                            for key in self.server.store.data))
+
+
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='author')
+        Post.objects.create(author=user, text='Пост')
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: None)
+        self.assertIs(Template.render, middleware._original_render)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_profile_header_and_log(self):
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        summary = json.loads(logs.records[0].getMessage())
+        self.assertEqual(summary['view'], 'posts:index')
+        self.assertEqual(summary['status'], 200)
+        self.assertGreater(summary['sql_count'], 0)
+        self.assertIn('posts/index.html', summary['templates'])
+        self.assertIn('posts/posts_list.html', summary['templates'])
+        # Фрагмент поста ещё не в кэше.
+        self.assertGreater(summary['cache_misses'], 0)
+        header = response['Server-Timing']
+        self.assertIn('sql;dur=', header)
+        self.assertIn('desc="posts/index.html"', header)
+        with self.assertLogs('core.profiling', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertGreater(json.loads(logs.records[0].getMessage())
+                           ['cache_hits'], summary['cache_hits'])
+        # Обёртка шаблонов снята после запроса.
+        self.assertIs(Template.render, middleware._original_render)
+
+    def test_duplicate_queries(self):
+        profile = Profile()
+        with connection.execute_wrapper(profile.record_query):
+            for _ in range(3):
+                list(Post.objects.filter(text='Пост'))
+            Post.objects.count()
+        summary = profile.summary(self.client.get('/').wsgi_request,
+                                  HttpResponse())
+        self.assertEqual(summary['sql_count'], 4)
+        self.assertEqual(summary['sql_duplicates'], 2)
+
+
+class MetricsTest(TestCase):
+    def test_counter_and_histogram_across_threads(self):
+        counter = Counter('test_total', 'Проверка', ['kind'])
+        histogram = Histogram('test_seconds', 'Проверка', buckets=(1, 2))
+
+        def work(number):
+            counter.inc(kind='a')
+            histogram.observe(number % 3)
+
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(work, range(30)))
+        self.assertEqual(counter.value(kind='a'), 30)
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{le="1"} 20', lines)
+        self.assertIn('test_seconds_bucket{le="2"} 30', lines)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 30', lines)
+        self.assertIn('test_seconds_sum 30.0', lines)
+        self.assertIn('test_seconds_count 30', lines)
+
+    def test_finished_threads_folded_into_total(self):
+        """Наборы завершившихся потоков не копятся, а значения остаются."""
+        counter = Counter('threads_total', 'Проверка')
+        threads = [threading.Thread(target=counter.inc) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        del threads, thread
+        gc.collect()
+        self.assertEqual(counter._shards, {})
+        counter.inc()
+        self.assertEqual(counter.value(), 6)
+
+    def test_label_escaping(self):
+        counter = Counter('escaped_total', 'Проверка', ['path'])
+        counter.inc(path='a"b\\c')
+        self.assertIn('escaped_total{path="a\\"b\\\\c"} 1', counter.render())
+
+    def test_endpoint(self):
+        user = User.objects.create_user(username='author')
+        Post.objects.create(author=user, text='Пост')
+        cache.clear()
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('http_request_sql_queries_count{view="posts:index"}',
+                      text)
+        self.assertIn('post_fragment_cache_total{result="hit"}', text)
+        self.assertIn('feed_fanout_lag_seconds_count', text)
+        with self.settings(METRICS_ALLOWED_IPS=['10.0.0.1']):
+            self.assertEqual(self.client.get('/metrics').status_code,
+                             HTTPStatus.NOT_FOUND)
+
+    def test_endpoint_is_local_by_default(self):
+        with self.settings():
+            del settings.METRICS_ALLOWED_IPS
+            self.assertEqual(self.client.get('/metrics').status_code,
+                             HTTPStatus.OK)
+            self.assertEqual(self.client.get(
+                '/metrics', REMOTE_ADDR='203.0.113.5').status_code,
+                HTTPStatus.NOT_FOUND)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_endpoint_token(self):
+        """За прокси на той же машине loopback не отличает сборщика."""
+        self.assertEqual(self.client.get('/metrics').status_code,
+                         HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code,
+            HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code,
+            HTTPStatus.OK)
+
+    def test_queries_on_every_database_counted(self):
+        """Запросы к реплике тоже попадают в число SQL-запросов."""
+        handler = ConnectionHandler({
+            alias: {'ENGINE': 'django.db.backends.sqlite3',
+                    'NAME': ':memory:'}
+            for alias in ('default', 'replica')})
+        observed = []
+
+        def view(request):
+            for alias in ('default', 'replica', 'replica'):
+                with handler[alias].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.resolver_match = None
+        with mock.patch.object(middleware, 'connections', handler), \
+                mock.patch.object(middleware.REQUEST_QUERIES, 'observe',
+                                  lambda value, **labels:
+                                  observed.append(value)):
+            middleware.MetricsMiddleware(view)(request)
+        handler.close_all()
+        self.assertEqual(observed, [3])
+
+
+class AsgiTest(TransactionTestCase):
+    """Запросы идут в потоке пула со своим соединением с базой,
+    поэтому данные теста должны быть закоммичены."""
+
+    def setUp(self):
+        cache.clear()
+        self.application = WsgiToAsgi(get_wsgi_application(), max_workers=2)
+
+    def tearDown(self):
+        self.application.executor.shutdown()
+
+    def call(self, scope, *incoming):
+        incoming = list(incoming) or [{'type': 'http.request'}]
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.application(scope, receive, send))
+        return sent
+
+    def request(self, path, headers=()):
+        return self.call({'type': 'http', 'method': 'GET', 'path': path,
+                          'headers': list(headers)})
+
+    def test_page(self):
+        user = User.objects.create_user(username='author')
+        Post.objects.create(author=user, text='Пост через ASGI')
+        start, *body = self.request(reverse('posts:index'))
+        self.assertEqual(start['type'], 'http.response.start')
+        self.assertEqual(start['status'], HTTPStatus.OK)
+        self.assertIn((b'content-type', b'text/html; charset=utf-8'),
+                      start['headers'])
+        self.assertFalse(body[-1].get('more_body'))
+        content = b''.join(message['body'] for message in body)
+        self.assertIn('Пост через ASGI'.encode(), content)
+
+    def test_not_found(self):
+        start, *body = self.request('/nonexist-page/')
+        self.assertEqual(start['status'], HTTPStatus.NOT_FOUND)
+
+    def test_lifespan(self):
+        sent = self.call({'type': 'lifespan'},
+                         {'type': 'lifespan.startup'},
+                         {'type': 'lifespan.shutdown'})
+        self.assertEqual([message['type'] for message in sent],
+                         ['lifespan.startup.complete',
+                          'lifespan.shutdown.complete'])
+
+    def test_environ(self):
+        environ = environ_from_scope({
+            'type': 'http', 'method': 'POST', 'path': '/create/',
+            'query_string': b'page=2', 'server': ('example.com', 8000),
+            'headers': [(b'content-type', b'text/plain'),
+                        (b'x-tag', b'a'), (b'x-tag', b'b')],
+        }, io.BytesIO(b'text'))
+        self.assertEqual(environ['REQUEST_METHOD'], 'POST')
+        self.assertEqual(environ['PATH_INFO'], '/create/')
+        self.assertEqual(environ['QUERY_STRING'], 'page=2')
+        self.assertEqual(environ['SERVER_PORT'], '8000')
+        self.assertEqual(environ['CONTENT_TYPE'], 'text/plain')
+        self.assertEqual(environ['HTTP_X_TAG'], 'a,b')
+        self.assertEqual(environ['wsgi.input'].read(), b'text')
+
+
+class DatabaseConfigTest(TestCase):
+    def test_sqlite(self):
+        databases = config.databases({}, 'sqlite:////srv/yatube/db.sqlite3')
+        default = databases['default']
+        self.assertEqual(default['ENGINE'], 'core.db.backends.sqlite3')
+        self.assertEqual(default['NAME'], '/srv/yatube/db.sqlite3')
+        self.assertEqual(default['CONN_MAX_AGE'], 60)
+        self.assertEqual(default['PRAGMAS']['journal_mode'], 'WAL')
+        self.assertNotIn('POOL', default)
+
+    def test_postgres_with_replicas_and_pool(self):
+        databases = config.databases({
+            'DATABASE_URL': 'postgres://yatube:p%40ss@db:6432/yatube'
+                            '?sslmode=require',
+            'DATABASE_REPLICA_URLS': 'postgres://ro@replica-a/yatube, '
+                                     'postgres://ro@replica-b/yatube',
+            'DB_POOL_SIZE': '20',
+        }, 'sqlite:///db.sqlite3')
+        default = databases['default']
+        self.assertEqual(default['ENGINE'], 'core.db.backends.postgresql')
+        self.assertEqual((default['USER'], default['PASSWORD'],
+                          default['HOST'], default['PORT'], default['NAME']),
+                         ('yatube', 'p@ss', 'db', '6432', 'yatube'))
+        self.assertEqual(default['OPTIONS'], {'sslmode': 'require'})
+        self.assertEqual(default['POOL'], {'MAX_SIZE': 20, 'TIMEOUT': 5.0})
+        self.assertEqual(default['CONN_MAX_AGE'], 0)
+        self.assertEqual(config.replicas(databases), ['replica1', 'replica2'])
+        self.assertEqual(databases['replica2']['HOST'], 'replica-b')
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(ImproperlyConfigured):
+            config.parse_url('mysql://db/yatube')
+
+    def test_sqlite_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+class ConnectionPoolTest(TestCase):
+    def setUp(self):
+        self.pool = Pool('test', max_size=2, timeout=0.01, check_after=0)
+
+    def tearDown(self):
+        self.pool.disconnect()
+
+    def connect(self):
+        return sqlite3.connect(':memory:', check_same_thread=False)
+
+    def test_reuse_and_limit(self):
+        first = self.pool.acquire(self.connect)
+        second = self.pool.acquire(self.connect)
+        with self.assertRaises(OperationalError):
+            self.pool.acquire(self.connect)
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(self.connect), first)
+        self.pool.release(first)
+        self.pool.release(second, reusable=False)
+        self.assertEqual(len(self.pool.idle), 1)
+
+    def test_broken_connection_replaced(self):
+        conn = self.pool.acquire(self.connect)
+        conn.close()
+        self.pool.release(conn)
+        fresh = self.pool.acquire(self.connect)
+        self.assertIsNot(fresh, conn)
+        self.pool.release(fresh)
+
+    def test_pooled_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = config.databases({'DB_POOL_SIZE': '2'}, 'sqlite:///'
+                                        + os.path.join(directory, 'db'))
+            handler = ConnectionHandler(database)
+            pooled = handler['default']
+            try:
+                with pooled.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                raw = pooled.connection
+                pooled.close()
+                self.assertEqual(len(pooled.pool.idle), 1)
+                pooled.ensure_connection()
+                self.assertIs(pooled.connection, raw)
+                pooled.close()
+            finally:
+                pooled.pool.disconnect()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_from_replica_until_write(self):
+        request_started.send(sender=None)
+        self.assertIn(self.router.db_for_read(Post), ['replica1', 'replica2'])
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        request_finished.send(sender=None)
+        self.assertIn(self.router.db_for_read(Post), ['replica1', 'replica2'])
+
+    def test_no_migrations_on_replicas(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+
+calls = []
+
+
+@jobs.task('tests.record')
+def record(value, failures=0):
+    calls.append(value)
+    if calls.count(value) <= failures:
+        raise RuntimeError('сбой')
+
+
+@jobs.task('tests.write_then_fail')
+def write_then_fail(text):
+    Job.objects.create(name='tests.record', args='[]')
+    raise RuntimeError(text)
+
+
+class JobsTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_work_off(self):
+        jobs.enqueue('tests.record', 'a')
+        jobs.enqueue('tests.record', 'b', delay=60)
+        self.assertEqual(jobs.work_off(), 1)
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(Job.objects.get(args='["a"]').status, Job.DONE)
+        self.assertEqual(Job.objects.get(args='["b"]').status, Job.PENDING)
+
+    def test_idempotency_key(self):
+        self.assertIsNotNone(jobs.enqueue('tests.record', 'a', key='once'))
+        self.assertIsNone(jobs.enqueue('tests.record', 'a', key='once'))
+        jobs.work_off()
+        self.assertIsNone(jobs.enqueue('tests.record', 'a', key='once'))
+        self.assertEqual(calls, ['a'])
+
+    def test_retry_then_fail(self):
+        job = jobs.enqueue('tests.record', 'a', 5, max_attempts=2)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertFalse(jobs.execute(jobs.claim()[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertIn('RuntimeError', job.last_error)
+        self.assertGreater(job.run_at, job.created_at)
+        self.assertEqual(jobs.claim(), [])
+        Job.objects.filter(pk=job.pk).update(run_at=job.created_at)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertFalse(jobs.execute(jobs.claim()[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_claimed_job_is_leased(self):
+        jobs.enqueue('tests.record', 'a')
+        self.assertEqual(len(jobs.claim()), 1)
+        self.assertEqual(jobs.claim(), [])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager(self):
+        jobs.defer('tests.record', 'a')
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.defer('tests.record', 'b', 1)
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_failure_rolls_back_only_the_task(self):
+        """Упавшая задача откатывается до точки сохранения, запись
+        запроса в той же транзакции остаётся."""
+        with transaction.atomic():
+            Job.objects.create(name='tests.record', args='["kept"]')
+            with self.assertLogs('core.jobs', 'ERROR'):
+                jobs.defer('tests.write_then_fail', 'сбой')
+        self.assertEqual(list(Job.objects.values_list('args', flat=True)),
+                         ['["kept"]'])
@@ -0,0 +1,32 @@
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def setting(name, default):
+    """Значение из settings или default, если настройка не задана."""
+    return getattr(settings, name, default)
+
+
+def batched(items, size):
+    """Списки по size элементов: большие выборки читаются пачками."""
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def shared_cache(alias):
+    """Кэш alias, если он общий для процессов сервера, иначе None.
+
+    Запись в LocMemCache видна только своему процессу: сброс версии или
+    объекта не дошёл бы до остальных воркеров.
+    """
+    cache = caches[alias]
+    if isinstance(cache, LocMemCache):
+        return None
+    return cache
@@ -1,4 +1,12 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import REGISTRY
+
+
+LOOPBACK = ('127.0.0.1', '::1')
 
 
 def page_not_found(request, exception):
@@ -17,3 +25,18 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def metrics(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', LOOPBACK)
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        raise Http404
+    # За прокси на той же машине все запросы приходят с 127.0.0.1,
+    # и отличить сборщик метрик можно только по токену.
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and not constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        raise Http404
+    return HttpResponse(REGISTRY.render(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
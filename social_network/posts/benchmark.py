@@ -0,0 +1,305 @@
+"""Нагрузочные замеры представлений posts.
+
+Данные заливаются пачками через bulk_create, значения полей даёт Faker.
+Граф подписок «скошенный»: популярность авторов распределена по Ципфу.
+"""
+import asyncio
+import datetime
+import io
+import random
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, reset_queries
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.asgi import WsgiToAsgi, environ_from_scope
+from core.utils import batched
+
+from . import counters, feed, moderation, transfer
+from .models import Comment, Follow, Group, Post, User
+
+
+TEXT_POOL = 10000
+METRICS = ('p50_ms', 'p99_ms', 'peak_kib')
+
+
+def seed(users=1000, posts=20000, follows=20, groups=20, comments=200,
+         seed=0, batch_size=5000):
+    """Заполняет базу и возвращает адреса, которые нужно замерить."""
+    from faker import Faker
+
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+    texts = [fake.text(max_nb_chars=300) for _ in range(TEXT_POOL)]
+
+    for batch in batched(range(users), batch_size):
+        User.objects.bulk_create(
+            [User(username=f'bench{i}', first_name=fake.first_name(),
+                  last_name=fake.last_name()) for i in batch])
+    user_ids = list(User.objects.filter(username__startswith='bench')
+                    .order_by('pk').values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        [Group(title=fake.sentence(nb_words=3), slug=f'bench-{i}',
+               description=fake.paragraph()) for i in range(groups)])
+    group_ids = list(Group.objects.filter(slug__startswith='bench-')
+                     .order_by('pk').values_list('pk', flat=True))
+
+    # Вес автора с рангом r пропорционален 1 / r.
+    weights = list(accumulate(1 / rank for rank in range(1, users + 1)))
+    start = timezone.now() - datetime.timedelta(days=365)
+    step = datetime.timedelta(days=365) / max(posts, 1)
+    first_id = (Post.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    for batch in batched(range(posts), batch_size):
+        transfer.insert(Post, [Post(
+            id=first_id + i,
+            author_id=rng.choices(user_ids, cum_weights=weights)[0],
+            group_id=rng.choice(group_ids + [None]),
+            text=rng.choice(texts),
+            pub_date=start + step * i,
+        ) for i in batch])
+    transfer.reset_sequences(Post)
+
+    edges = set()
+    for user_id in user_ids:
+        for author_id in rng.choices(user_ids, cum_weights=weights,
+                                     k=follows):
+            if author_id != user_id:
+                edges.add((user_id, author_id))
+    for batch in batched(sorted(edges), batch_size):
+        Follow.objects.bulk_create(
+            [Follow(user_id=user_id, author_id=author_id)
+             for user_id, author_id in batch], ignore_conflicts=True)
+
+    author, reader = user_ids[0], user_ids[-1]
+    post = Post.objects.filter(author_id=author).first()
+    Comment.objects.bulk_create(
+        [Comment(post=post, author_id=rng.choice(user_ids),
+                 text=rng.choice(texts)) for _ in range(comments)])
+    counters.recount_users(User.objects.all())
+    counters.recount_posts(Post.objects.all())
+    for author_id in Follow.objects.filter(user_id=reader).values_list(
+            'author_id', flat=True):
+        feed.backfill(reader, author_id)
+
+    username = User.objects.get(pk=author).username
+    return reader, {
+        'index': reverse('posts:index'),
+        'group_posts': reverse('posts:group_list',
+                               kwargs={'slug': 'bench-0'}),
+        'profile': reverse('posts:profile', kwargs={'username': username}),
+        'post_detail': reverse('posts:post_detail',
+                               kwargs={'post_id': post.pk}),
+        'follow_index': reverse('posts:follow_index'),
+    }
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def measure(reader_id, urls, repeat=50):
+    """Число запросов, p50/p99 и пик выделенной памяти по каждому адресу."""
+    client = Client()
+    client.force_login(User.objects.get(pk=reader_id))
+    results = {}
+    for name, url in urls.items():
+        client.get(url)
+        # Журнал запросов ограничен, после заливки он уже заполнен.
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+        query_count = len(queries)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        # Память меряется отдельно: tracemalloc искажает время.
+        tracemalloc.start()
+        client.get(url)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {
+            'queries': query_count,
+            'p50_ms': round(percentile(timings, 0.5), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'peak_kib': round(peak / 1024, 1),
+        }
+    return results
+
+
+TEMPLATE_PAGES = ('index', 'group_posts', 'profile', 'follow_index')
+NO_CACHE = {'default': {
+    'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def _templates(cached):
+    templates = [dict(engine, OPTIONS=dict(engine['OPTIONS']))
+                 for engine in settings.TEMPLATES]
+    loaders = settings.TEMPLATE_LOADERS
+    templates[0]['OPTIONS']['loaders'] = (
+        [('django.template.loaders.cached.Loader', loaders)] if cached
+        else loaders)
+    return templates
+
+
+def measure_templates(reader_id, urls, repeat=50):
+    """p50 ответа лент без кэша фрагментов: каждый пост рендерится.
+
+    default — шаблоны читаются и компилируются заново на каждой
+    странице (режим DEBUG), cached — кэширующий загрузчик.
+    """
+    client = Client()
+    client.force_login(User.objects.get(pk=reader_id))
+    results = {name: {} for name in TEMPLATE_PAGES}
+    for mode in ('default', 'cached'):
+        with override_settings(TEMPLATES=_templates(mode == 'cached'),
+                               CACHES=NO_CACHE):
+            for name in TEMPLATE_PAGES:
+                client.get(urls[name])
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    client.get(urls[name])
+                    timings.append((time.perf_counter() - started) * 1000)
+                results[name][f'{mode}_p50_ms'] = round(
+                    percentile(timings, 0.5), 3)
+    return results
+
+
+def measure_moderation(patterns=10000, lengths=(1000, 10000, 100000),
+                       seed=0):
+    """Время проверки текста в наносекундах на символ.
+
+    Для автомата оно не должно расти ни с длиной текста, ни с числом
+    шаблонов.
+    """
+    from faker import Faker
+
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    words = {f'{fake.word()}{i}' for i in range(patterns)}
+    started = time.perf_counter()
+    automaton = moderation.Automaton(sorted(words))
+    build_ms = (time.perf_counter() - started) * 1000
+    sample = ' '.join(fake.words(nb=2000))
+    results = {}
+    for length in lengths:
+        text = (sample * (length // len(sample) + 1))[:length]
+        started = time.perf_counter()
+        automaton.find(text)
+        elapsed = time.perf_counter() - started
+        results[str(length)] = round(elapsed * 10 ** 9 / length, 1)
+    return {'patterns': len(words), 'build_ms': round(build_ms, 1),
+            'ns_per_char': results}
+
+
+def _scope(url, cookie):
+    path, _, query = url.partition('?')
+    return {'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': query.encode(),
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())]}
+
+
+def _call_wsgi(application, scope):
+    started = time.perf_counter()
+    statuses = []
+    chunks = application(environ_from_scope(scope, io.BytesIO()),
+                         lambda status, headers, exc_info=None:
+                         statuses.append(status))
+    b''.join(chunks)
+    chunks.close()
+    return time.perf_counter() - started, statuses[0].startswith('200')
+
+
+async def _call_asgi(application, scope):
+    started = time.perf_counter()
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return time.perf_counter() - started, messages[0]['status'] == 200
+
+
+def _load_summary(timings, elapsed):
+    latencies = [latency * 1000 for latency, ok in timings]
+    return {
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'errors': sum(not ok for latency, ok in timings),
+    }
+
+
+def load_test(reader_id, urls, concurrency=16, requests=400):
+    """Пропускная способность под WSGI и через ASGI-адаптер core.asgi.
+
+    Оба режима гоняют одно и то же приложение в процессе, без сети, с
+    одинаковой параллельностью; адреса перебираются по кругу.
+    """
+    client = Client()
+    client.force_login(User.objects.get(pk=reader_id))
+    session = client.cookies[settings.SESSION_COOKIE_NAME].value
+    cookie = f'{settings.SESSION_COOKIE_NAME}={session}'
+    scopes = list(islice((_scope(url, cookie)
+                          for _ in range(requests) for url in urls.values()),
+                         requests))
+    wsgi = get_wsgi_application()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        timings = list(pool.map(lambda scope: _call_wsgi(wsgi, scope),
+                                scopes))
+    results = {'wsgi': _load_summary(timings,
+                                     time.perf_counter() - started)}
+
+    asgi = WsgiToAsgi(wsgi, max_workers=concurrency)
+
+    async def run():
+        limit = asyncio.Semaphore(concurrency)
+
+        async def one(scope):
+            async with limit:
+                return await _call_asgi(asgi, scope)
+
+        return await asyncio.gather(*(one(scope) for scope in scopes))
+
+    started = time.perf_counter()
+    timings = asyncio.run(run())
+    results['asgi'] = _load_summary(timings, time.perf_counter() - started)
+    asgi.executor.shutdown()
+    return results
+
+
+def compare(current, baseline, tolerance=0.2):
+    """Список регрессий относительно сохранённого результата."""
+    regressions = []
+    for name, result in current.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if result['queries'] > old['queries']:
+            regressions.append(
+                f'{name}: запросов {result["queries"]} > {old["queries"]}')
+        for metric in METRICS:
+            limit = old[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {result[metric]} > {limit:.3f}')
+    return regressions
@@ -0,0 +1,46 @@
+"""Что изменилось с момента T.
+
+Post.updated_at и Comment.updated_at — версии записей: save() меняет
+их сам, а массовые изменения через update() проходят через
+touch_posts(). По этим колонкам (обе с индексом) кэши и ленты могут
+обновлять только то, что действительно поменялось. Удаления здесь не
+видны: о них сообщают сигналы post_delete.
+"""
+from django.db.models import Max
+from django.utils import timezone
+
+from . import object_cache
+from .models import Comment, Post
+
+
+def touch_posts(posts):
+    """Отмечает посты изменёнными, не вызывая save() и сигналы."""
+    touched = posts.update(updated_at=timezone.now())
+    if touched:
+        # Список pk не собирается целиком: у автора их может быть много.
+        object_cache.invalidate(Post, posts.values_list(
+            'pk', flat=True).iterator())
+    return touched
+
+
+def changed_posts(since):
+    return (Post.objects.filter(updated_at__gt=since)
+            .order_by('updated_at', 'pk'))
+
+
+def changed_comments(since):
+    return (Comment.objects.filter(updated_at__gt=since)
+            .order_by('updated_at', 'pk'))
+
+
+def changed_post_ids(since):
+    """Посты, у которых после since изменились сами посты или комментарии."""
+    ids = set(changed_posts(since).values_list('pk', flat=True))
+    ids.update(changed_comments(since).exclude(post=None)
+               .values_list('post_id', flat=True))
+    return ids
+
+
+def last_change(queryset):
+    """Время последнего изменения в выборке или None для пустой."""
+    return queryset.order_by().aggregate(last=Max('updated_at'))['last']
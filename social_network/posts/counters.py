@@ -0,0 +1,41 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def bump(model, pk, field, delta):
+    """Атомарно меняет счётчик одной строки выражением F()."""
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        # Разошедшийся счётчик не должен уйти в минус.
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    updated = rows.update(**{field: F(field) + delta})
+    if not updated and model is UserStats and delta > 0:
+        # Строки ещё нет: пересчёт уже учтёт сохранённую запись.
+        recount_users(User.objects.filter(pk=pk))
+
+
+def _count_of(model, field, outer):
+    counted = (model.objects.filter(**{field: OuterRef(outer)}).order_by()
+               .values(field).annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(counted), 0)
+
+
+def recount_users(users):
+    """Создаёт недостающие строки UserStats и пересчитывает их."""
+    users = users.order_by()
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in users.values_list('pk', flat=True)],
+        ignore_conflicts=True)
+    return UserStats.objects.filter(user__in=users.values('pk')).update(
+        posts_count=_count_of(Post, 'author', 'user'),
+        followers_count=_count_of(Follow, 'author', 'user'),
+        following_count=_count_of(Follow, 'user', 'user'),
+    )
+
+
+def recount_posts(posts):
+    """Пересчитывает Post.comments_count."""
+    return posts.order_by().update(
+        comments_count=_count_of(Comment, 'post', 'pk'))
@@ -0,0 +1,162 @@
+import heapq
+from itertools import islice
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core import metrics
+from core.utils import batched, setting
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+
+# Сколько последних постов автора попадает в ленту при подписке.
+BACKFILL_POSTS = 100
+BATCH_SIZE = 1000
+
+FANOUT_LAG = metrics.histogram(
+    'feed_fanout_lag_seconds',
+    'Сколько прошло от публикации поста до его появления во всех лентах.')
+
+
+def fanout_limit():
+    return setting('FEED_FANOUT_LIMIT', None)
+
+
+def is_celebrity(author_id):
+    """Авторы с огромным числом подписчиков не раскладываются по лентам."""
+    limit = fanout_limit()
+    if limit is None:
+        return False
+    return UserStats.objects.filter(user_id=author_id,
+                                    followers_count__gt=limit).exists()
+
+
+def mark_pulled(author_id):
+    """Запоминает, что посты автора придётся подмешивать при чтении."""
+    UserStats.objects.filter(user_id=author_id,
+                             feed_pulled=False).update(feed_pulled=True)
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if is_celebrity(post.author_id):
+        mark_pulled(post.author_id)
+        return
+    followers = (Follow.objects.filter(author_id=post.author_id)
+                 .values_list('user_id', flat=True).iterator())
+    for users in batched(followers, BATCH_SIZE):
+        FeedEntry.objects.bulk_create(
+            [FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+             for user_id in users], ignore_conflicts=True)
+    FANOUT_LAG.observe((timezone.now() - post.pub_date).total_seconds())
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора, на которого подписались."""
+    if is_celebrity(author_id):
+        return
+    posts = (Post.objects.filter(author_id=author_id)
+             .order_by('-pub_date', '-pk')
+             .values_list('pk', 'pub_date')[:BACKFILL_POSTS])
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts],
+        ignore_conflicts=True)
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    FeedEntry.objects.filter(user_id=user_id,
+                             post__author_id=author_id).delete()
+
+
+def rebuild():
+    """Заново раскладывает по лентам последние посты каждого автора.
+
+    Нужна после массовой загрузки, когда сигналы не срабатывали.
+    """
+    FeedEntry.objects.all().delete()
+    authors = (Follow.objects.order_by('author_id').values_list(
+        'author_id', flat=True).distinct().iterator())
+    for author_id in authors:
+        if is_celebrity(author_id):
+            mark_pulled(author_id)
+            continue
+        posts = list(Post.objects.filter(author_id=author_id)
+                     .order_by('-pub_date', '-pk')
+                     .values_list('pk', 'pub_date')[:BACKFILL_POSTS])
+        followers = (Follow.objects.filter(author_id=author_id)
+                     .values_list('user_id', flat=True).iterator())
+        if not posts:
+            continue
+        for users in batched(followers, max(BATCH_SIZE // len(posts), 1)):
+            FeedEntry.objects.bulk_create(
+                [FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+                 for user_id in users for pk, pub_date in posts],
+                ignore_conflicts=True)
+
+
+def pulled_authors_followed_by(user):
+    """Авторы из подписок, чьи посты могут отсутствовать в ленте.
+
+    Это нынешние «звёзды» и авторы, которые ими были: пост, созданный
+    выше лимита, так и не разложен, даже если подписчиков стало меньше.
+    """
+    pulled = Q(feed_pulled=True)
+    limit = fanout_limit()
+    if limit is not None:
+        pulled |= Q(followers_count__gt=limit)
+    followed = Follow.objects.filter(user=user).values('author_id')
+    return list(UserStats.objects.filter(pulled, user_id__in=followed)
+                .values_list('user_id', flat=True))
+
+
+class MergedFeed:
+    """Слияние нескольких уже отсортированных выборок постов.
+
+    Поддерживает ровно то, что нужно CursorPaginator: order_by, filter
+    и срез. Каждая выборка читается не дальше конца среза, поэтому
+    выборки не должны пересекаться: дубль укоротил бы страницу.
+    """
+
+    def __init__(self, *querysets, descending=True):
+        self.querysets = querysets
+        self.descending = descending
+
+    def order_by(self, *fields):
+        return MergedFeed(*(qs.order_by(*fields) for qs in self.querysets),
+                          descending=fields[0].startswith('-'))
+
+    def filter(self, *args, **kwargs):
+        return MergedFeed(*(qs.filter(*args, **kwargs)
+                            for qs in self.querysets),
+                          descending=self.descending)
+
+    def __getitem__(self, key):
+        merged = heapq.merge(*(qs[:key.stop] for qs in self.querysets),
+                             key=lambda post: (post.feed_date, post.pk),
+                             reverse=self.descending)
+        return list(islice(merged, key.start, key.stop))
+
+
+def follow_feed(user):
+    """Лента подписок, упорядоченная по (feed_date, feed_post).
+
+    Материализованная часть читается одним диапазоном индекса
+    feed_user_date_idx; посты «звёзд», которых в ней нет, подмешиваются
+    при чтении.
+    """
+    entries = (Post.objects.filter(feed_entries__user=user)
+               .select_related('author', 'group')
+               .annotate(feed_date=F('feed_entries__pub_date'),
+                         feed_post=F('feed_entries__post')))
+    authors = pulled_authors_followed_by(user)
+    if not authors:
+        return entries
+    # Пост «звезды» мог попасть в ленту до того, как автор ею стал.
+    pulled = (Post.objects.filter(author__in=authors)
+              .exclude(feed_entries__user=user)
+              .select_related('author', 'group')
+              .annotate(feed_date=F('pub_date'), feed_post=F('pk')))
+    return MergedFeed(entries, pulled)
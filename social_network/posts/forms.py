@@ -2,29 +2,25 @@ from django import forms
 from django.core.exceptions import ValidationError
 
 from .models import Post, Comment
+from .moderation import find_forbidden
 
 
-class PostForm(forms.ModelForm):
+class ModeratedTextMixin:
+    def clean_text(self):
+        '''Текст не должен содержать слов из запрещённого списка'''
+        text = self.cleaned_data['text']
+        if find_forbidden(text) is not None:
+            raise ValidationError("Forbidden word!")
+        return text
+
+
+class PostForm(ModeratedTextMixin, forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
 
-class CommentForm(forms.ModelForm):
+class CommentForm(ModeratedTextMixin, forms.ModelForm):
     class Meta:
         model = Comment
         fields = ['text']
-
-    def clean_text(self):
-        '''Самая примитивная реализация отбора'''
-        old_comment = self.cleaned_data['text']
-        comment = self.cleaned_data['text']
-        regulation = ['Пушкин', 'Толстой']
-        for element in range(len(regulation)):
-            regulation[element] = regulation[element].upper()
-        regulation = set(regulation)
-        comment = comment.upper()
-        comment = set(comment.split(' '))
-        if comment.intersection(regulation):
-            raise ValidationError("Forbidden word!")
-        return old_comment
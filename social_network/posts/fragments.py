@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from core import metrics
+
+
+TEMPLATE = 'posts/posts_list.html'
+# В ключе есть updated_at поста, поэтому правка сразу даёт новый ключ;
+# срок жизни только освобождает место от старых версий.
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+SEPARATOR = '<hr>'
+
+FRAGMENT_CACHE = metrics.counter(
+    'post_fragment_cache_total', 'Фрагменты постов из кэша и отрендеренные.',
+    ['result'])
+
+
+def variant(profile_link_flag, author_link):
+    return f'{int(bool(profile_link_flag))}{int(bool(author_link))}'
+
+
+def fragment_key(post, flags):
+    version = f'{post.updated_at.timestamp():.6f}' if post.updated_at else ''
+    return f'post_fragment:{post.pk}:{version}:{flags}'
+
+
+def iter_posts(context, posts, profile_link_flag=False, author_link=False):
+    """HTML постов страницы по одному, с готовыми фрагментами из кэша.
+
+    Фрагмент зависит только от поста и флагов, поэтому один и тот же
+    HTML используется всеми лентами и всеми пользователями. Кэш
+    читается одним get_many на страницу.
+    """
+    posts = list(posts)
+    flags = variant(profile_link_flag, author_link)
+    keys = [fragment_key(post, flags) for post in posts]
+    cached = cache.get_many(keys)
+    # Шаблон поста компилируется один раз на страницу (с кэширующим
+    # загрузчиком — на процесс), а посты рендерятся в общем контексте:
+    # как тело цикла, а не как {% include %} на каждой итерации.
+    template = get_template(TEMPLATE).template
+    item_context = context.new({
+        'profile_link_flag': profile_link_flag,
+        'author_link': author_link,
+    })
+    missing = {}
+    for key, post in zip(keys, posts):
+        html = cached.get(key)
+        if html is None:
+            with item_context.push(post=post):
+                html = template.render(item_context)
+            if not getattr(post, 'thumbnail_pending', False):
+                missing[key] = html
+        yield html
+    FRAGMENT_CACHE.inc(len(cached), result='hit')
+    FRAGMENT_CACHE.inc(len(keys) - len(cached), result='miss')
+    if missing:
+        cache.set_many(missing, FRAGMENT_TIMEOUT)
+
+
+def render_posts(context, posts, profile_link_flag=False, author_link=False):
+    return mark_safe(SEPARATOR.join(
+        iter_posts(context, posts, profile_link_flag, author_link)))
@@ -0,0 +1,130 @@
+"""Валидаторы ETag и Last-Modified для условных GET-запросов.
+
+Каждой области данных соответствует версия в кэше — время последнего
+изменения. Сигналы обновляют версии: 'posts' — любой пост, автор или
+группа в лентах; 'post:<id>' — пост и его комментарии, в том числе
+имена комментаторов; 'user:<id>' — имя, счётчики и подписки
+пользователя; 'group:<id>' — название группы. Представление сравнивает
+версии своих областей с заголовками запроса до пагинации и рендеринга
+шаблона.
+
+Версии хранятся бессрочно в кэше FRESHNESS_CACHE_ALIAS, и он должен
+быть общим для всех процессов: изменение, отмеченное в одном воркере,
+иначе не дошло бы до остальных, и они отвечали бы 304 по старой версии.
+Если это кэш в памяти процесса (LocMemCache), условные запросы
+отключены и страницы всегда отдаются целиком.
+"""
+import datetime
+import hashlib
+import time
+
+from django.conf import settings
+
+from core.utils import batched, setting, shared_cache
+
+from . import object_cache
+
+
+VERSION_PREFIX = 'freshness'
+BATCH_SIZE = 500
+
+
+def _key(scope):
+    return f'{VERSION_PREFIX}:{scope}'
+
+
+def _cache():
+    return shared_cache(setting('FRESHNESS_CACHE_ALIAS', 'default'))
+
+
+def touch(*scopes):
+    """Отмечает изменение данных в областях."""
+    touch_many(scopes)
+
+
+def touch_many(scopes):
+    """То же для итератора областей любой длины."""
+    cache = _cache()
+    if cache is None:
+        return
+    now = time.time()
+    for batch in batched(scopes, BATCH_SIZE):
+        cache.set_many({_key(scope): now for scope in batch}, None)
+
+
+def versions(scopes):
+    """Версии областей или None, если общего кэша версий нет."""
+    cache = _cache()
+    if cache is None:
+        return None
+    keys = [_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    # Версия вытеснена из кэша: данные считаются изменившимися сейчас.
+    missing = {key: time.time() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+    return [found.get(key) or missing[key] for key in keys]
+
+
+def _state(request, scopes, forms):
+    if not hasattr(request, '_freshness'):
+        request._freshness = _validators(request, scopes, forms)
+    return request._freshness
+
+
+def _validators(request, scopes, forms):
+    # Страница зависит от пользователя: ссылки, кнопка подписки.
+    user = request.user.pk if request.user.is_authenticated else 0
+    parts = [str(user), request.get_full_path()]
+    if forms and user:
+        # В формах токен из CSRF-cookie: после нового входа cookie другая,
+        # и страница с прежним токеном не должна считаться свежей.
+        token = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        if not token:
+            return None
+        parts.append(token)
+    stamps = versions(scopes)
+    if stamps is None:
+        return None
+    source = '|'.join(parts + [repr(stamp) for stamp in stamps])
+    return (hashlib.md5(source.encode()).hexdigest(),
+            datetime.datetime.fromtimestamp(max(stamps),
+                                            datetime.timezone.utc))
+
+
+def scoped(scopes_for, forms=False):
+    """Пара функций для django.views.decorators.http.condition.
+
+    scopes_for(request, **kwargs) возвращает области страницы или None,
+    если проверять нечего (например, объекта нет и будет 404). forms —
+    на странице есть формы с CSRF-токеном для вошедшего пользователя.
+    """
+    def validator(index):
+        def func(request, *args, **kwargs):
+            scopes = scopes_for(request, **kwargs)
+            if not scopes:
+                return None
+            state = _state(request, scopes, forms)
+            return state and state[index]
+        return func
+
+    return {'etag_func': validator(0), 'last_modified_func': validator(1)}
+
+
+def feed_scopes(request, **kwargs):
+    return ['posts']
+
+
+def profile_scopes(request, username):
+    author = object_cache.users.get(username=username)
+    return author and ['posts', f'user:{author.pk}']
+
+
+def post_scopes(request, post_id):
+    post = object_cache.posts.get(id=post_id)
+    if post is None:
+        return None
+    scopes = [f'post:{post_id}', f'user:{post.author_id}']
+    if post.group_id is not None:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
@@ -0,0 +1,78 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import benchmark, object_cache
+
+
+class Command(BaseCommand):
+    help = ('Заполняет отдельную тестовую базу и замеряет запросы, '
+            'задержки и память представлений posts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--comments', type=int, default=200,
+                            help='Комментариев у замеряемого поста.')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--moderation-patterns', type=int,
+                            default=10000,
+                            help='Размер списка запрещённых слов.')
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help='Параллельных запросов в сравнении '
+                                 'WSGI и ASGI.')
+        parser.add_argument('--load-requests', type=int, default=400,
+                            help='Запросов в сравнении WSGI и ASGI; '
+                                 '0 — не сравнивать.')
+        parser.add_argument('--output', help='Куда записать JSON.')
+        parser.add_argument('--baseline',
+                            help='JSON прошлого прогона для сравнения.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимый рост времени и памяти.')
+
+    def handle(self, *args, **options):
+        # Замеры идут на тестовой базе, рабочие данные не трогаются.
+        old_name = connection.creation.create_test_db(verbosity=0,
+                                                      autoclobber=True)
+        try:
+            reader, urls = benchmark.seed(
+                users=options['users'], posts=options['posts'],
+                follows=options['follows'], groups=options['groups'],
+                comments=options['comments'], seed=options['seed'])
+            object_cache.clear()
+            views = benchmark.measure(reader, urls, options['repeat'])
+            hit_ratios = object_cache.report()
+            templates = benchmark.measure_templates(reader, urls,
+                                                    options['repeat'])
+            load = (benchmark.load_test(reader, urls, options['concurrency'],
+                                        options['load_requests'])
+                    if options['load_requests'] else None)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        keys = ('users', 'posts', 'follows', 'groups', 'comments', 'repeat')
+        report = json.dumps({
+            'params': {key: options[key] for key in keys},
+            'views': views,
+            'object_cache': hit_ratios,
+            'templates': templates,
+            'load': load,
+            'moderation': benchmark.measure_moderation(
+                options['moderation_patterns'], seed=options['seed']),
+        }, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = benchmark.compare(
+                    views, json.load(baseline)['views'],
+                    options['tolerance'])
+            if regressions:
+                raise CommandError('Регрессии:\n' + '\n'.join(regressions))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты, комментарии или подписки в NDJSON/CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(transfer.KINDS))
+        parser.add_argument('--output', default='-',
+                            help='Файл для записи; по умолчанию stdout.')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help='По умолчанию — по расширению файла.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=transfer.CHUNK_SIZE,
+                            help='Сколько строк читать из базы за раз.')
+
+    def handle(self, *args, kind, output, chunk_size, **options):
+        fmt = options['format'] or ('csv' if output.endswith('.csv')
+                                    else 'ndjson')
+        rows = transfer.export_rows(kind, chunk_size)
+        if output == '-':
+            total = transfer.write(rows, kind, self.stdout, fmt)
+        else:
+            with open(output, 'w', encoding='utf-8', newline='') as target:
+                total = transfer.write(rows, kind, target, fmt)
+        self.stderr.write(f'Выгружено строк: {total}')
@@ -0,0 +1,38 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии или подписки из '
+            'NDJSON/CSV пачками многострочным INSERT.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(transfer.KINDS))
+        parser.add_argument('source', help='Файл с данными или «-».')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help='По умолчанию — по расширению файла.')
+        parser.add_argument('--batch-size', type=int,
+                            default=transfer.CHUNK_SIZE,
+                            help='Сколько строк вставлять за раз.')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='Не пересчитывать счётчики, ленты и '
+                                 'поисковый индекс после загрузки; '
+                                 'потом их пересчитает rebuild_derived.')
+
+    def handle(self, *args, kind, source, batch_size, no_rebuild,
+               **options):
+        fmt = options['format'] or ('csv' if source.endswith('.csv')
+                                    else 'ndjson')
+        if source == '-':
+            total = transfer.load(transfer.read(sys.stdin, fmt), kind,
+                                  batch_size)
+        else:
+            with open(source, encoding='utf-8', newline='') as data:
+                total = transfer.load(transfer.read(data, fmt), kind,
+                                      batch_size)
+        if not no_rebuild:
+            transfer.rebuild(kind)
+        self.stdout.write(self.style.SUCCESS(f'Загружено строк: {total}'))
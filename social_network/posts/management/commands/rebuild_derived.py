@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики, ленты, поисковый индекс и '
+            'популярность, например после import_data --no-rebuild.')
+
+    def handle(self, *args, **options):
+        transfer.rebuild()
+        self.stdout.write(self.style.SUCCESS('Производные данные готовы'))
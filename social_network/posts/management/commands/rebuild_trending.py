@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает оценки популярности постов и групп, например '
+            'после смены TRENDING_HALF_LIFE.')
+
+    def handle(self, *args, **options):
+        posts, groups = trending.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Оценено постов: {posts}, групп: {groups}'))
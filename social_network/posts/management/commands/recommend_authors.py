@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации «Кого почитать» пользователей, '
+            'чьи подписки менялись.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересчитать всех пользователей.')
+        parser.add_argument('--top', type=int, default=recommendations.TOP_K,
+                            help='Рекомендаций на пользователя.')
+
+    def handle(self, *args, **options):
+        users = (User.objects.values_list('pk', flat=True)
+                 if options['all'] else None)
+        count = recommendations.refresh(users, options['top'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {count}'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_posts, recount_users
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, подписок и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Сколько строк пересчитывать за раз.')
+
+    def handle(self, *args, batch_size, **options):
+        users = self.recount(User.objects.all(), recount_users, batch_size)
+        posts = self.recount(Post.objects.all(), recount_posts, batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано пользователей: {users}, постов: {posts}'))
+
+    def recount(self, queryset, recount, batch_size):
+        # Диапазоны по pk: каждая пачка — короткий отдельный UPDATE.
+        total = 0
+        last_pk = 0
+        while True:
+            pks = list(queryset.filter(pk__gt=last_pk).order_by('pk')
+                       .values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return total
+            total += recount(queryset.filter(pk__gte=pks[0],
+                                             pk__lte=pks[-1]))
+            last_pk = pks[-1]
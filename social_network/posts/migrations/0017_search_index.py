@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:51
+
+from django.db import DatabaseError, migrations, models
+import django.db.models.deletion
+
+
+def create_fts_table(apps, schema_editor):
+    # На других СУБД поиск работает по PostTerm, его заполняет
+    # manage.py rebuild_search_index.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+                "text, tokenize='unicode61 remove_diacritics 2')")
+        except DatabaseError:
+            # SQLite собран без FTS5.
+            return
+        cursor.execute('INSERT INTO posts_post_fts(rowid, text) '
+                       'SELECT id, text FROM posts_post')
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Слово')),
+                ('weight', models.FloatField(verbose_name='Вес')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='posts.Post')),
+            ],
+            options={
+                'verbose_name': 'Слово поста',
+                'verbose_name_plural': 'Слова постов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_post_term'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupTrend',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='posts.Group')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+            ],
+            options={
+                'verbose_name': 'Популярность группы',
+                'verbose_name_plural': 'Популярность групп',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTrend',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='posts.Post')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+            ],
+            options={
+                'verbose_name': 'Популярность поста',
+                'verbose_name_plural': 'Популярность постов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='posttrend',
+            index=models.Index(fields=['score'], name='post_trend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grouptrend',
+            index=models.Index(fields=['score'], name='group_trend_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    # Посты нынешних «звёзд» до миграции уже не раскладывались.
+    limit = getattr(settings, 'FEED_FANOUT_LIMIT', None)
+    if limit is None:
+        return
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(followers_count__gt=limit).update(
+        feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_pulled',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Посты читаются из ленты напрямую'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
-from core.models import CreatedModel
+from core.models import CreatedModel, UpdatedModel
 
 
 User = get_user_model()
@@ -16,7 +16,7 @@ class Group(models.Model):
         return self.title
 
 
-class Post(CreatedModel):
+class Post(CreatedModel, UpdatedModel):
     text = models.TextField('Текст поста', help_text='Введите текст поста')
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
@@ -30,18 +30,30 @@ class Post(CreatedModel):
                               verbose_name='Группа',
                               help_text='Выберете группу')
     image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+    comments_count = models.PositiveIntegerField('Число комментариев',
+                                                 default=0, editable=False)
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы по возрастанию: обратный проход по ним даёт порядок
+        # (pub_date DESC, id DESC), нужный CursorPaginator.
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_date_idx'),
+            models.Index(fields=['updated_at'], name='post_updated_idx'),
+        ]
 
     def __str__(self):
         LEN_OF_POST = 15
         return self.text[:LEN_OF_POST]
 
 
-class Comment(CreatedModel):
+class Comment(CreatedModel, UpdatedModel):
     post = models.ForeignKey(Post,
                              on_delete=models.CASCADE,
                              related_name='comments',
@@ -58,6 +70,10 @@ class Comment(CreatedModel):
         ordering = ['-pub_date']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [models.Index(fields=['post', 'pub_date'],
+                                name='comment_post_date_idx'),
+                   models.Index(fields=['updated_at'],
+                                name='comment_updated_idx')]
 
 
 class Follow(models.Model):
@@ -72,3 +88,107 @@ class Follow(models.Model):
         verbose_name_plural = 'Лента авторов'
         constraints = [models.UniqueConstraint(
             fields=['user', 'author'], name='unique_members')]
+        indexes = [models.Index(fields=['author', 'user'],
+                                name='follow_author_user_idx')]
+
+
+class FeedEntry(models.Model):
+    """Материализованная лента подписок: пост автора у каждого подписчика."""
+    user = models.ForeignKey(User, related_name='feed_entries',
+                             on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='feed_entries',
+                             on_delete=models.CASCADE)
+    # Копия Post.pub_date, чтобы лента читалась одним проходом по индексу.
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'], name='unique_feed_entry')]
+        indexes = [models.Index(fields=['user', '-pub_date', '-post'],
+                                name='feed_user_date_idx')]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые обновляются вместе с записями."""
+    user = models.OneToOneField(User, primary_key=True, related_name='stats',
+                                on_delete=models.CASCADE)
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    # Follow.author == user
+    followers_count = models.PositiveIntegerField('Число подписчиков',
+                                                  default=0)
+    # Follow.user == user
+    following_count = models.PositiveIntegerField('Число подписок',
+                                                  default=0)
+    # Подписки менялись после расчёта рекомендаций.
+    recommendations_stale = models.BooleanField(
+        'Рекомендации устарели', default=True, editable=False)
+    # Хотя бы один пост автора не раскладывался по лентам: такие посты
+    # подмешиваются при чтении, даже когда подписчиков снова немного.
+    feed_pulled = models.BooleanField(
+        'Посты читаются из ленты напрямую', default=False, editable=False)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+
+class PostTerm(models.Model):
+    """Обратный индекс для поиска, когда FTS5 недоступен."""
+    term = models.CharField('Слово', max_length=64)
+    post = models.ForeignKey(Post, related_name='terms',
+                             on_delete=models.CASCADE)
+    # Доля слова в тексте поста.
+    weight = models.FloatField('Вес')
+
+    class Meta:
+        verbose_name = 'Слово поста'
+        verbose_name_plural = 'Слова постов'
+        constraints = [models.UniqueConstraint(
+            fields=['term', 'post'], name='unique_post_term')]
+
+
+class Recommendation(models.Model):
+    """Автор, которого стоит почитать пользователю; см. recommendations."""
+    user = models.ForeignKey(User, related_name='recommendations',
+                             on_delete=models.CASCADE)
+    author = models.ForeignKey(User, related_name='+',
+                               on_delete=models.CASCADE)
+    # Сколько раз автор встречается в подписках читателей тех же авторов.
+    score = models.PositiveIntegerField('Оценка')
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'author'], name='unique_recommendation')]
+        # Обратный проход по индексу даёт порядок for_user().
+        indexes = [models.Index(fields=['user', 'score', 'author'],
+                                name='recommendation_user_idx')]
+
+
+class PostTrend(models.Model):
+    """Оценка популярности поста; см. trending."""
+    post = models.OneToOneField(Post, primary_key=True, related_name='trend',
+                                on_delete=models.CASCADE)
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        verbose_name = 'Популярность поста'
+        verbose_name_plural = 'Популярность постов'
+        indexes = [models.Index(fields=['score'], name='post_trend_idx')]
+
+
+class GroupTrend(models.Model):
+    """Оценка популярности группы; см. trending."""
+    group = models.OneToOneField(Group, primary_key=True,
+                                 related_name='trend',
+                                 on_delete=models.CASCADE)
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        verbose_name = 'Популярность группы'
+        verbose_name_plural = 'Популярность групп'
+        indexes = [models.Index(fields=['score'], name='group_trend_idx')]
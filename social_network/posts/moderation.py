@@ -0,0 +1,96 @@
+"""Проверка текста на запрещённые слова и фразы.
+
+Список загружается один раз в автомат Ахо — Корасик, после чего текст
+любой длины проверяется за один проход независимо от размера списка.
+Слова сравниваются целиком и без учёта регистра: текст и шаблоны
+приводятся к виду « слово слово », поэтому знаки препинания и
+повторные пробелы не мешают совпадению.
+"""
+import functools
+import re
+from collections import deque
+
+from django.conf import settings
+
+
+TOKEN = re.compile(r'\w+')
+
+
+def normalize(text):
+    return ' ' + ' '.join(TOKEN.findall(text.casefold())) + ' '
+
+
+class Automaton:
+    """Автомат Ахо — Корасик по нормализованным шаблонам."""
+
+    def __init__(self, patterns):
+        self.patterns = []
+        self.goto = [{}]
+        # Номер шаблона, который заканчивается в состоянии или в одном
+        # из его суффиксов; -1 — совпадения нет.
+        self.output = [-1]
+        for pattern in patterns:
+            normalized = normalize(pattern)
+            if normalized.strip():
+                self._add(normalized, len(self.patterns))
+                self.patterns.append(pattern)
+        self.fail = [0] * len(self.goto)
+        self._link()
+
+    def _add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            following = self.goto[state].get(char)
+            if following is None:
+                following = len(self.goto)
+                self.goto[state][char] = following
+                self.goto.append({})
+                self.output.append(-1)
+            state = following
+        if self.output[state] == -1:
+            self.output[state] = index
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[following] = target if target != following else 0
+                if self.output[following] == -1:
+                    self.output[following] = self.output[self.fail[following]]
+
+    def find(self, text):
+        """Первый найденный в тексте шаблон или None."""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in normalize(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] != -1:
+                return self.patterns[output[state]]
+        return None
+
+
+def load_words():
+    words = list(getattr(settings, 'MODERATION_WORDS', ()))
+    path = getattr(settings, 'MODERATION_WORDS_FILE', None)
+    if path:
+        with open(path, encoding='utf-8') as source:
+            words.extend(line.strip() for line in source
+                         if line.strip() and not line.startswith('#'))
+    return words
+
+
+@functools.lru_cache(maxsize=None)
+def get_automaton():
+    return Automaton(load_words())
+
+
+def find_forbidden(text):
+    return get_automaton().find(text)
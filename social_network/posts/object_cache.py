@@ -0,0 +1,203 @@
+"""Двухуровневый кэш часто читаемых объектов: групп, авторов, постов.
+
+Первый уровень — LRU в памяти процесса с коротким сроком жизни, второй —
+общий для процессов кэш OBJECT_CACHE_ALIAS. Объект хранится по pk, поиск
+по slug или username идёт через запись-ссылку «значение → pk». Сигналы
+post_save и post_delete сбрасывают объект в своём процессе и в общем
+кэше; в остальных процессах копия живёт не дольше
+OBJECT_CACHE_LOCAL_TIMEOUT. Если OBJECT_CACHE_ALIAS — кэш в памяти
+процесса (LocMemCache), второго уровня нет: иначе чужие процессы
+отдавали бы устаревший объект OBJECT_CACHE_TIMEOUT секунд.
+
+У пользователей кэшируются только публичные поля: хэш пароля и почта
+в общий кэш не попадают.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.http import Http404
+
+from core.utils import batched, setting, shared_cache
+
+from .models import Group, Post, User
+
+
+class LRU:
+    """Ограниченный по числу записей словарь со сроком жизни записей."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self.data[key] = (value, time.monotonic() + timeout)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+# Поля автора, которые показываются на страницах.
+PUBLIC_USER_FIELDS = ('id', 'username', 'first_name', 'last_name')
+
+
+def public_fields(model, prefix=''):
+    if model is User:
+        names = PUBLIC_USER_FIELDS
+    else:
+        names = [field.name for field in model._meta.concrete_fields]
+    return [prefix + name for name in names]
+
+
+class ObjectCache:
+    def __init__(self, model, select_related=()):
+        self.model = model
+        self.select_related = select_related
+        self.fields = public_fields(model) + [
+            name for relation in select_related
+            for name in public_fields(
+                model._meta.get_field(relation).related_model,
+                f'{relation}__')]
+        self.prefix = f'object:{model._meta.label_lower}'
+        self.local = LRU(setting('OBJECT_CACHE_SIZE', 1000))
+        self.hits = {'local': 0, 'shared': 0, 'miss': 0}
+
+    @property
+    def shared(self):
+        return shared_cache(setting('OBJECT_CACHE_ALIAS', 'default'))
+
+    def _key(self, field, value):
+        return f'{self.prefix}:{field}:{value}'
+
+    def _read(self, key):
+        """Значение записи и уровень, на котором оно нашлось."""
+        value = self.local.get(key)
+        if value is not None:
+            return value, 'local'
+        if self.shared is None:
+            return None, 'miss'
+        value = self.shared.get(key)
+        if value is not None:
+            self.local.set(key, value,
+                           setting('OBJECT_CACHE_LOCAL_TIMEOUT', 5))
+            return value, 'shared'
+        return None, 'miss'
+
+    def _write(self, key, value):
+        self.local.set(key, value, setting('OBJECT_CACHE_LOCAL_TIMEOUT', 5))
+        if self.shared is not None:
+            self.shared.set(key, value, setting('OBJECT_CACHE_TIMEOUT', 300))
+
+    def _cached(self, field, value):
+        key = self._key('pk', value)
+        if field != 'pk':
+            pk, tier = self._read(self._key(field, value))
+            if pk is None:
+                return None, tier
+            key = self._key('pk', pk)
+        data, tier = self._read(key)
+        if data is None:
+            return None, 'miss'
+        # Копия из pickle: изменения объекта в представлении не
+        # попадают в кэш.
+        obj = pickle.loads(data)
+        if field != 'pk' and getattr(obj, field) != value:
+            # Ссылка устарела: например, пользователь сменил username.
+            self.delete_alias(field, value)
+            return None, 'miss'
+        return obj, tier
+
+    def get(self, **lookup):
+        """Объект по единственному полю или None, если его нет."""
+        (field, value), = lookup.items()
+        if field in ('id', self.model._meta.pk.name):
+            field = 'pk'
+        obj, tier = self._cached(field, value)
+        self.hits[tier] += 1
+        if obj is not None:
+            return obj
+        obj = (self.model.objects.select_related(*self.select_related)
+               .only(*self.fields).filter(**{field: value}).first())
+        if obj is not None:
+            self._write(self._key('pk', obj.pk),
+                        pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+            if field != 'pk':
+                self._write(self._key(field, value), obj.pk)
+        return obj
+
+    def get_or_404(self, **lookup):
+        obj = self.get(**lookup)
+        if obj is None:
+            raise Http404(f'No {self.model._meta.object_name} matches '
+                          f'the given query.')
+        return obj
+
+    def invalidate(self, pks):
+        keys = [self._key('pk', pk) for pk in pks]
+        for key in keys:
+            self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete_many(keys)
+
+    def delete_alias(self, field, value):
+        key = self._key(field, value)
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        self.hits = dict.fromkeys(self.hits, 0)
+
+    def stats(self):
+        total = sum(self.hits.values())
+        return dict(self.hits, hit_ratio=round(
+            (self.hits['local'] + self.hits['shared']) / total, 3)
+            if total else None)
+
+
+BATCH_SIZE = 500
+
+groups = ObjectCache(Group)
+users = ObjectCache(User)
+posts = ObjectCache(Post, select_related=('author', 'group'))
+BY_MODEL = {Group: groups, User: users, Post: posts}
+
+
+def invalidate(model, pks):
+    for batch in batched(pks, BATCH_SIZE):
+        BY_MODEL[model].invalidate(batch)
+
+
+def clear():
+    for object_cache in BY_MODEL.values():
+        object_cache.clear()
+
+
+def report():
+    """Доли попаданий по моделям, например для bench_views."""
+    return {model._meta.label_lower: object_cache.stats()
+            for model, object_cache in BY_MODEL.items()}
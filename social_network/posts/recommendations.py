@@ -0,0 +1,176 @@
+"""Рекомендации авторов «Кого почитать» по графу подписок.
+
+Считаются пакетно (manage.py recommend_authors), а не в запросе: граф
+подписок загружается в массивы CSR — для каждого пользователя отрезок
+общего массива с номерами авторов, на которых он подписан, и такой же
+обратный граф подписчиков. Оценка автора для пользователя — сколько раз
+он встречается в подписках тех, кто читает тех же авторов. Не хватает
+оценок — список дополняют самые читаемые авторы.
+
+Подписка или отписка помечает рекомендации пользователя устаревшими
+(UserStats.recommendations_stale), и следующий запуск пересчитывает
+только их. NumPy ускоряет подсчёт, но не обязателен.
+"""
+import heapq
+from array import array
+from collections import Counter
+
+from django.db import transaction
+
+from core.utils import batched
+
+from .models import Follow, Recommendation, UserStats
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+TOP_K = 10
+# У популярного автора учитываются не все подписчики: иначе один
+# пользователь обходит почти весь граф.
+MAX_CO_FOLLOWERS = 1000
+BATCH_SIZE = 500
+
+
+def _csr(rows, cols, size):
+    """Массивы indptr и indices строк rows со значениями cols."""
+    indptr = array('q', [0]) * (size + 1)
+    for row in rows:
+        indptr[row + 1] += 1
+    for number in range(size):
+        indptr[number + 1] += indptr[number]
+    position = array('q', indptr[:-1])
+    indices = array('q', [0]) * len(cols)
+    for row, col in zip(rows, cols):
+        indices[position[row]] = col
+        position[row] += 1
+    return indptr, indices
+
+
+class FollowGraph:
+    def __init__(self, edges):
+        users, authors = array('q'), array('q')
+        for user_id, author_id in edges:
+            users.append(user_id)
+            authors.append(author_id)
+        # Номера пользователей подряд с нуля вместо разреженных pk.
+        self.ids = array('q', sorted(set(users) | set(authors)))
+        self.index = {pk: number for number, pk in enumerate(self.ids)}
+        users = array('q', (self.index[pk] for pk in users))
+        authors = array('q', (self.index[pk] for pk in authors))
+        size = len(self.ids)
+        self.following = _csr(users, authors, size)
+        self.followers = _csr(authors, users, size)
+        self.popular = [number for number in sorted(
+            range(size), key=lambda number: -self._degree(number))
+            if self._degree(number)][:TOP_K * 2]
+        if numpy is not None:
+            self.following = tuple(numpy.frombuffer(part, dtype=numpy.int64)
+                                   for part in self.following)
+            self.followers = tuple(numpy.frombuffer(part, dtype=numpy.int64)
+                                   for part in self.followers)
+
+    @classmethod
+    def load(cls):
+        return cls(Follow.objects.order_by().values_list('user_id',
+                                                         'author_id')
+                   .iterator())
+
+    def _degree(self, number):
+        indptr = self.followers[0]
+        return indptr[number + 1] - indptr[number]
+
+    @staticmethod
+    def _row(graph, number, limit=None):
+        indptr, indices = graph
+        start, end = indptr[number], indptr[number + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        return indices[start:end]
+
+    def _co_follow_counts(self, number):
+        followed = self._row(self.following, number)
+        co_followers = [follower for author in followed
+                        for follower in self._row(self.followers, author,
+                                                  MAX_CO_FOLLOWERS)
+                        if follower != number]
+        if numpy is not None:
+            rows = [self._row(self.following, follower)
+                    for follower in co_followers]
+            if not rows:
+                return {}
+            counts = numpy.bincount(numpy.concatenate(rows))
+            found = numpy.flatnonzero(counts)
+            return dict(zip(found.tolist(), counts[found].tolist()))
+        counts = Counter()
+        for follower in co_followers:
+            counts.update(self._row(self.following, follower))
+        return counts
+
+    def recommend(self, user_id, k=TOP_K):
+        """Пары (pk автора, оценка) по убыванию оценки."""
+        number = self.index.get(user_id)
+        if number is None:
+            scores = {}
+            excluded = set()
+        else:
+            scores = self._co_follow_counts(number)
+            excluded = set(self._row(self.following, number).tolist()
+                           if numpy is not None
+                           else self._row(self.following, number))
+            excluded.add(number)
+        # При равной оценке выше более новый автор, как и в for_user().
+        best = heapq.nlargest(
+            k, ((score, self.ids[author]) for author, score in scores.items()
+                if author not in excluded),
+        )
+        result = [(pk, score) for score, pk in best]
+        chosen = {pk for pk, score in result}
+        for author in self.popular:
+            if len(result) >= k:
+                break
+            pk = self.ids[author]
+            if author not in excluded and pk not in chosen and pk != user_id:
+                result.append((pk, 0))
+        return result
+
+
+def refresh(users=None, k=TOP_K):
+    """Пересчитывает рекомендации пользователей; по умолчанию устаревшие.
+
+    Возвращает число пересчитанных пользователей.
+    """
+    if users is None:
+        users = UserStats.objects.filter(
+            recommendations_stale=True).values_list('user_id', flat=True)
+    users = list(users)
+    # Флаг снимается до загрузки графа: подписка во время пересчёта
+    # снова пометит пользователя, и следующий запуск его учтёт.
+    for batch in batched(users, BATCH_SIZE):
+        UserStats.objects.filter(user_id__in=batch).update(
+            recommendations_stale=False)
+    graph = FollowGraph.load()
+    total = 0
+    for batch in batched(users, BATCH_SIZE):
+        rows = [Recommendation(user_id=user_id, author_id=author_id,
+                               score=score)
+                for user_id in batch
+                for author_id, score in graph.recommend(user_id, k)]
+        with transaction.atomic():
+            Recommendation.objects.filter(user_id__in=batch).delete()
+            Recommendation.objects.bulk_create(rows)
+        total += len(batch)
+    return total
+
+
+def mark_stale(user_id):
+    UserStats.objects.filter(user_id=user_id).update(
+        recommendations_stale=True)
+
+
+def for_user(user, k=TOP_K):
+    return list(Recommendation.objects.filter(user=user)
+                .select_related('author')
+                .order_by('-score', '-author_id')[:k])
@@ -0,0 +1,210 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite с FTS5 используется виртуальная таблица posts_post_fts
+с ранжированием bm25. На остальных базах работает обратный индекс
+PostTerm, который строится токенизатором на Python.
+"""
+import math
+import re
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models import (Case, Count, F, FloatField, Sum, Value,
+                              When)
+
+from core.utils import batched
+
+from .models import Post, PostTerm
+
+
+FTS_TABLE = 'posts_post_fts'
+TOKEN = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+BATCH_SIZE = 1000
+DOCUMENTS_KEY = 'search:documents'
+DOCUMENTS_TIMEOUT = 600
+
+
+def tokenize(text):
+    return [token.casefold()[:MAX_TERM_LENGTH]
+            for token in TOKEN.findall(text)]
+
+
+def _filter_sql(filters):
+    sql = []
+    params = []
+    for column in ('group_id', 'author_id'):
+        if filters.get(column) is not None:
+            sql.append(f' AND p.{column} = %s')
+            params.append(filters[column])
+    return ''.join(sql), params
+
+
+class Fts5Backend:
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post.pk])
+            cursor.execute(f'INSERT INTO {FTS_TABLE}(rowid, text) '
+                           f'VALUES (%s, %s)', [post.pk, post.text])
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(f'INSERT INTO {FTS_TABLE}(rowid, text) '
+                           f'SELECT id, text FROM posts_post')
+
+    def _match(self, query):
+        # Каждое слово — отдельная фраза в кавычках: спецсимволы FTS5
+        # из пользовательского ввода не попадают в запрос.
+        return ' '.join(f'"{token}"' for token in tokenize(query))
+
+    def count(self, query, filters):
+        match = self._match(query)
+        if not match:
+            return 0
+        where, params = _filter_sql(filters)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} '
+                f'JOIN posts_post p ON p.id = {FTS_TABLE}.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s{where}', [match] + params)
+            return cursor.fetchone()[0]
+
+    def search(self, query, filters, offset, limit):
+        match = self._match(query)
+        if not match:
+            return []
+        where, params = _filter_sql(filters)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT p.id FROM {FTS_TABLE} '
+                f'JOIN posts_post p ON p.id = {FTS_TABLE}.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s{where} '
+                f'ORDER BY bm25({FTS_TABLE}), p.id DESC LIMIT %s OFFSET %s',
+                [match] + params + [limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class InvertedIndexBackend:
+    def __init__(self):
+        self._idfs = {}
+
+    def index(self, post):
+        PostTerm.objects.filter(post=post).delete()
+        PostTerm.objects.bulk_create(self._terms(post.pk, post.text))
+
+    def remove(self, post_id):
+        PostTerm.objects.filter(post_id=post_id).delete()
+
+    def rebuild(self):
+        PostTerm.objects.all().delete()
+        posts = Post.objects.order_by().values_list('pk', 'text').iterator()
+        for batch in batched(posts, BATCH_SIZE):
+            PostTerm.objects.bulk_create(
+                [term for pk, text in batch
+                 for term in self._terms(pk, text)])
+
+    def _terms(self, post_id, text):
+        tokens = tokenize(text)
+        return [PostTerm(term=term, post_id=post_id,
+                         weight=frequency / len(tokens))
+                for term, frequency in Counter(tokens).items()]
+
+    def _ranked(self, query, filters):
+        """Подходящие посты с оценкой tf-idf; считает и сортирует база."""
+        terms = set(tokenize(query))
+        if not terms:
+            return PostTerm.objects.none()
+        idf = self._idf(frozenset(terms))
+        postings = PostTerm.objects.filter(term__in=terms)
+        for column in ('group_id', 'author_id'):
+            if filters.get(column) is not None:
+                postings = postings.filter(**{f'post__{column}':
+                                              filters[column]})
+        return (postings.values('post_id')
+                .annotate(score=Sum(F('weight') * Case(
+                    *(When(term=term, then=Value(value))
+                      for term, value in idf.items()),
+                    default=Value(0.0), output_field=FloatField())),
+                    matched=Count('term', distinct=True))
+                .filter(matched=len(terms))
+                .order_by('-score', '-post_id'))
+
+    def _idf(self, terms):
+        if terms not in self._idfs:
+            total = documents()
+            frequency = dict(PostTerm.objects.filter(term__in=terms)
+                             .values('term').annotate(n=Count('post_id'))
+                             .values_list('term', 'n'))
+            self._idfs[terms] = {
+                term: math.log(1 + total / frequency[term])
+                for term in terms if term in frequency}
+        return self._idfs[terms]
+
+    def count(self, query, filters):
+        return self._ranked(query, filters).count()
+
+    def search(self, query, filters, offset, limit):
+        return list(self._ranked(query, filters)
+                    .values_list('post_id', flat=True)[offset:offset + limit])
+
+
+def documents():
+    """Число постов для idf; точность не нужна, поэтому из кэша."""
+    total = cache.get(DOCUMENTS_KEY)
+    if total is None:
+        total = Post.objects.count()
+        cache.set(DOCUMENTS_KEY, total, DOCUMENTS_TIMEOUT)
+    return total or 1
+
+
+_fts5_tables = {}
+
+
+def fts5_available():
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts5_tables:
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(f'SELECT 1 FROM {FTS_TABLE} LIMIT 0')
+                _fts5_tables[name] = True
+            except DatabaseError:
+                _fts5_tables[name] = False
+    return _fts5_tables[name]
+
+
+def get_backend():
+    name = getattr(settings, 'POST_SEARCH_BACKEND', 'auto')
+    if name == 'fts5' or (name == 'auto' and fts5_available()):
+        return Fts5Backend()
+    return InvertedIndexBackend()
+
+
+class SearchResults:
+    """Ленивый список найденных постов для Paginator."""
+
+    def __init__(self, query, group_id=None, author_id=None):
+        self.backend = get_backend()
+        self.query = query
+        self.filters = {'group_id': group_id, 'author_id': author_id}
+
+    def count(self):
+        return self.backend.count(self.query, self.filters)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        ids = self.backend.search(self.query, self.filters, key.start,
+                                  key.stop - key.start)
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
@@ -0,0 +1,193 @@
+from itertools import chain
+
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from core import jobs
+
+from . import (changes, counters, freshness, moderation, object_cache,
+               recommendations, thumbnails, trending)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+# Поля пользователя, которые видны на страницах сайта.
+DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def _display_changed(instance, update_fields):
+    if update_fields is not None and not set(update_fields) & set(
+            DISPLAY_FIELDS):
+        return False
+    if instance._state.adding:
+        return True
+    stored = (User.objects.filter(pk=instance.pk)
+              .values(*DISPLAY_FIELDS).first())
+    return stored is None or any(
+        stored[name] != getattr(instance, name) for name in DISPLAY_FIELDS)
+
+
+@receiver(pre_save, sender=User)
+def remember_display_change(sender, instance, update_fields=None,
+                            raw=False, **kwargs):
+    # Смена пароля или почты не меняет страниц: сравниваем видимые
+    # поля с сохранённой строкой до записи.
+    instance._display_changed = raw or _display_changed(instance,
+                                                        update_fields)
+
+
+@receiver(post_save, sender=User)
+def touch_author_posts(sender, instance, created, **kwargs):
+    # Во фрагменте поста и в кэше постов есть имя автора.
+    if not created and getattr(instance, '_display_changed', True):
+        changes.touch_posts(instance.posts.all())
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def touch_group_posts(sender, instance, **kwargs):
+    # Название и slug группы есть во фрагменте; при удалении группы
+    # посты меняются через UPDATE без сигналов.
+    changes.touch_posts(instance.posts.all())
+
+
+@receiver([post_save, post_delete], sender=Group)
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_cached_object(sender, instance, **kwargs):
+    pks = [instance.pk]
+    object_cache.invalidate(sender, pks)
+    # Повтор после коммита: конкурентный запрос мог успеть положить
+    # в кэш версию, прочитанную до коммита.
+    transaction.on_commit(lambda: object_cache.invalidate(sender, pks))
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump(UserStats, instance.author_id, 'posts_count', 1)
+        jobs.defer('posts.fan_out', instance.pk, key=f'fan-out:{instance.pk}')
+
+
+@receiver(post_save, sender=Post)
+def score_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def score_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.post_id:
+        trending.record_comment(instance, instance.post.group_id)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, raw=False, **kwargs):
+    if instance.image and not raw:
+        name, pk = instance.image.name, instance.pk
+        transaction.on_commit(lambda: thumbnails.schedule(name, pk))
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        jobs.defer('posts.reindex', instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    jobs.defer('posts.reindex', instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.bump(UserStats, instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.post_id:
+        counters.bump(Post, instance.post_id, 'comments_count', 1)
+        object_cache.invalidate(Post, [instance.post_id])
+        jobs.defer('posts.notify_comment', instance.pk,
+                   key=f'comment-email:{instance.pk}')
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.bump(Post, instance.post_id, 'comments_count', -1)
+        object_cache.invalidate(Post, [instance.post_id])
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump(UserStats, instance.author_id, 'followers_count', 1)
+        counters.bump(UserStats, instance.user_id, 'following_count', 1)
+        jobs.defer('posts.sync_feed', instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_feed(sender, instance, **kwargs):
+    counters.bump(UserStats, instance.author_id, 'followers_count', -1)
+    counters.bump(UserStats, instance.user_id, 'following_count', -1)
+    jobs.defer('posts.sync_feed', instance.user_id, instance.author_id)
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def stale_recommendations(sender, instance, raw=False, **kwargs):
+    if not raw:
+        recommendations.mark_stale(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def touch_post_pages(sender, instance, **kwargs):
+    freshness.touch('posts', f'post:{instance.pk}',
+                    f'user:{instance.author_id}')
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def touch_comment_pages(sender, instance, **kwargs):
+    freshness.touch(f'post:{instance.post_id}')
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def touch_follow_pages(sender, instance, **kwargs):
+    freshness.touch(f'user:{instance.user_id}',
+                    f'user:{instance.author_id}')
+
+
+@receiver([post_save, post_delete], sender=Group)
+def touch_group_pages(sender, instance, **kwargs):
+    # Страницы постов группы зависят от её области 'group:<id>'.
+    freshness.touch('posts', f'group:{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=User)
+def touch_user_pages(sender, instance, signal, **kwargs):
+    # Вход, смена пароля или почты страниц не меняют.
+    if signal is post_save and not getattr(instance, '_display_changed',
+                                           True):
+        return
+    # Имя комментатора есть на страницах постов, которые он обсуждал.
+    commented = (Comment.objects.filter(author_id=instance.pk)
+                 .order_by().values_list('post_id', flat=True)
+                 .distinct().iterator())
+    freshness.touch_many(chain(
+        ['posts', f'user:{instance.pk}'],
+        (f'post:{post_id}' for post_id in commented)))
+
+
+@receiver(setting_changed)
+def reload_forbidden_words(sender, setting, **kwargs):
+    if setting in ('MODERATION_WORDS', 'MODERATION_WORDS_FILE'):
+        moderation.get_automaton.cache_clear()
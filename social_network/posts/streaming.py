@@ -0,0 +1,60 @@
+"""Потоковая отдача страниц с лентой постов.
+
+Со STREAMING_FEEDS = True страница рендерится без постов: тег post_list
+оставляет на их месте метку. Всё до метки — head, шапка, переключатель
+лент — уходит клиенту сразу, затем посты по одному по мере рендера,
+затем остаток страницы. Контекст-процессоры работают как обычно: это
+тот же render_to_string с запросом.
+
+Заголовки и статус уходят до рендера постов, поэтому ошибка в посте
+обрывает ответ, а не даёт страницу 500. Django Debug и тесты,
+которым нужен response.context, работают в обычном режиме.
+"""
+import secrets
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .fragments import SEPARATOR, iter_posts
+
+
+CONTEXT_KEY = 'post_stream'
+
+
+class PostStream:
+    def __init__(self):
+        # Метку нельзя подделать текстом поста: она случайна на запрос.
+        self.token = secrets.token_hex(8)
+        self.deferred = []
+
+    def marker(self, number):
+        return f'<!--posts:{self.token}:{number}-->'
+
+    def defer(self, context, posts, profile_link_flag, author_link):
+        """Запоминает посты для рендера при отдаче и возвращает метку."""
+        # Копия контекста переживает окончание рендера страницы.
+        self.deferred.append((context.new(), posts, profile_link_flag,
+                              author_link))
+        return mark_safe(self.marker(len(self.deferred) - 1))
+
+    def chunks(self, page):
+        for number, (context, posts, *flags) in enumerate(self.deferred):
+            head, _, page = page.partition(self.marker(number))
+            yield head
+            for position, html in enumerate(iter_posts(context, posts,
+                                                       *flags)):
+                yield SEPARATOR + html if position else html
+        yield page
+
+
+def render_feed(request, template_name, context):
+    if not getattr(settings, 'STREAMING_FEEDS', False):
+        return render(request, template_name, context)
+    stream = PostStream()
+    context = dict(context, **{CONTEXT_KEY: stream})
+    page = render_to_string(template_name, context, request)
+    return StreamingHttpResponse(stream.chunks(page),
+                                 content_type='text/html; charset=utf-8')
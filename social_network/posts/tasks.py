@@ -0,0 +1,57 @@
+"""Фоновые задачи постов для core.jobs.
+
+Задачи получают pk и читают актуальное состояние из базы: к моменту
+выполнения пост могли изменить или удалить, а повтор задачи не должен
+ничего испортить.
+"""
+from django.core.mail import send_mail
+
+from core import jobs
+
+from . import feed, search, thumbnails
+from .models import Comment, Follow, Post
+
+
+@jobs.task('posts.fan_out')
+def fan_out(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        feed.fan_out(post)
+
+
+@jobs.task('posts.sync_feed')
+def sync_feed(user_id, author_id):
+    """Лента после подписки или отписки: смотрит, что верно сейчас."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        feed.backfill(user_id, author_id)
+    else:
+        feed.trim(user_id, author_id)
+
+
+@jobs.task('posts.reindex')
+def reindex(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        search.get_backend().remove(post_id)
+    else:
+        search.get_backend().index(post)
+
+
+@jobs.task('posts.thumbnails')
+def generate_thumbnails(name, post_id):
+    thumbnails.create(name, post_id)
+
+
+@jobs.task('posts.notify_comment')
+def notify_comment(comment_id):
+    comment = (Comment.objects.select_related('author', 'post__author')
+               .filter(pk=comment_id).first())
+    if comment is None:
+        return
+    author = comment.post.author
+    if not author.email or author == comment.author:
+        return
+    send_mail(
+        f'Новый комментарий к посту «{comment.post}»',
+        f'{comment.author.username}: {comment.text}',
+        None, [author.email])
@@ -0,0 +1,15 @@
+from django import template
+
+from posts.fragments import render_posts
+from posts.streaming import CONTEXT_KEY
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_list(context, posts, profile_link_flag=False, author_link=False):
+    stream = context.get(CONTEXT_KEY)
+    if stream is not None:
+        return stream.defer(context, posts, profile_link_flag, author_link)
+    return render_posts(context, posts, profile_link_flag, author_link)
@@ -0,0 +1,22 @@
+from django import template
+
+from posts import thumbnails
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(post, geometry, **options):
+    """Миниатюра картинки поста, если она уже создана.
+
+    Во время рендера картинки не обрабатываются: отсутствующая миниатюра
+    ставится в очередь, а шаблон показывает заглушку.
+    """
+    im = thumbnails.ready_thumbnail(post.image, geometry, **options)
+    if im is None and post.image:
+        # Фрагмент с заглушкой не должен попасть в кэш.
+        post.thumbnail_pending = True
+        if thumbnails.workers():
+            thumbnails.schedule(post.image.name, post.pk)
+    return im
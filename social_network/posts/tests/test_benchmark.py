@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from posts import benchmark
+from posts.models import Post
+
+
+class BenchmarkTest(TestCase):
+    def test_seed_and_measure(self):
+        """Заливка и замеры работают на маленьком объёме."""
+        cache.clear()
+        reader, urls = benchmark.seed(users=20, posts=60, follows=5,
+                                      groups=3, comments=5)
+        self.assertEqual(Post.objects.count(), 60)
+        results = benchmark.measure(reader, urls, repeat=2)
+        self.assertEqual(set(results), {'index', 'group_posts', 'profile',
+                                        'post_detail', 'follow_index'})
+        for name, result in results.items():
+            with self.subTest(view=name):
+                self.assertGreater(result['queries'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_measure_templates(self):
+        cache.clear()
+        reader, urls = benchmark.seed(users=10, posts=30, follows=3,
+                                      groups=2, comments=2)
+        results = benchmark.measure_templates(reader, urls, repeat=2)
+        self.assertEqual(set(results), set(benchmark.TEMPLATE_PAGES))
+        for name, result in results.items():
+            with self.subTest(view=name):
+                self.assertEqual(set(result),
+                                 {'default_p50_ms', 'cached_p50_ms'})
+
+    def test_compare_reports_regressions(self):
+        baseline = {'index': {'queries': 3, 'p50_ms': 10, 'p99_ms': 20,
+                              'peak_kib': 100}}
+        current = {'index': {'queries': 4, 'p50_ms': 11, 'p99_ms': 30,
+                             'peak_kib': 100}}
+        regressions = benchmark.compare(current, baseline, tolerance=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertFalse(benchmark.compare(baseline, baseline))
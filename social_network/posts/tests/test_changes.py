@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import changes
+from posts.models import Comment, Group, Post
+
+
+User = get_user_model()
+
+
+class ChangesTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.post = Post.objects.create(author=self.user, text='Текст')
+        self.quiet = Post.objects.create(author=self.user, text='Тишина')
+        self.since = timezone.now()
+
+    def updated_at(self, post):
+        return Post.objects.values_list('updated_at', flat=True).get(
+            pk=post.pk)
+
+    def test_post_edit_view(self):
+        client = self.client
+        client.force_login(self.user)
+        pub_date = self.post.pub_date
+        client.post(reverse('posts:post_edit',
+                            kwargs={'post_id': self.post.pk}),
+                    {'text': 'Правка'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.pub_date, pub_date)
+        self.assertGreater(self.post.updated_at, self.since)
+        self.assertEqual(changes.changed_post_ids(self.since),
+                         {self.post.pk})
+
+    def test_admin_list_editable(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:posts_post_changelist'), {
+            'form-TOTAL_FORMS': '1',
+            'form-INITIAL_FORMS': '1',
+            'form-0-id': self.post.pk,
+            'form-0-group': self.group.pk,
+            '_save': 'Сохранить',
+        })
+        self.assertEqual(Post.objects.get(pk=self.post.pk).group,
+                         self.group)
+        self.assertGreater(self.updated_at(self.post), self.since)
+
+    def test_comments_and_bulk_changes(self):
+        Comment.objects.create(post=self.post, author=self.user, text='К')
+        self.assertEqual(changes.changed_post_ids(self.since),
+                         {self.post.pk})
+        self.assertEqual(changes.changed_posts(self.since).count(), 0)
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual(set(changes.changed_posts(self.since)),
+                         {self.post, self.quiet})
+
+    def test_hidden_user_fields_do_not_touch_posts(self):
+        """Смена пароля или почты не меняет страниц с постами автора."""
+        self.user.set_password('secret')
+        self.user.email = 'author@example.com'
+        self.user.save()
+        self.user.first_name = 'Автор'
+        self.user.save(update_fields=['password'])
+        self.assertEqual(changes.changed_posts(self.since).count(), 0)
+        self.user.save(update_fields=['first_name'])
+        self.assertEqual(changes.changed_posts(self.since).count(), 2)
+
+    def test_touch_without_pk_list(self):
+        """Посты автора обновляются одним UPDATE без списка IN (…): у
+        плодовитого автора он упёрся бы в предел параметров SQLite."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(changes.touch_posts(self.user.posts.all()), 2)
+        updates = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn(' IN (', updates[0])
+        self.assertGreater(self.updated_at(self.quiet), self.since)
+
+    def test_group_delete_touches_posts(self):
+        Post.objects.filter(pk=self.post.pk).update(group=self.group)
+        self.group.delete()
+        self.assertEqual(list(changes.changed_posts(self.since)),
+                         [self.post])
+
+    def test_last_change(self):
+        self.assertIsNone(changes.last_change(Post.objects.none()))
+        self.assertEqual(changes.last_change(Post.objects.all()),
+                         self.updated_at(self.quiet))
@@ -0,0 +1,61 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, UserStats
+
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, подписками и комментариями."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        comment = Comment.objects.create(post=self.post, author=self.reader,
+                                         text='Комментарий')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        comment.delete()
+        Follow.objects.all().delete()
+        Post.objects.create(author=self.author, text='Второй пост')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_recount_stats_fixes_drift(self):
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        UserStats.objects.filter(user=self.reader).delete()
+        Post.objects.update(comments_count=7)
+        call_command('recount_stats', batch_size=1, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.reader).posts_count, 0)
+
+    def test_profile_reads_counters_without_count_queries(self):
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        # Первый запрос кладёт автора в кэш объектов.
+        Client().get(url)
+        # Счётчики автора и страница постов.
+        with self.assertNumQueries(2) as queries:
+            response = Client().get(url)
+        self.assertContains(response, 'Всего постов: 1')
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import FeedEntry, Follow, Post
+
+
+User = get_user_model()
+
+
+class FeedFanOutTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_posts(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_new_post_fanned_out_to_followers(self):
+        """Новый пост попадает в материализованную ленту подписчика."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader,
+                                                 post=post).exists())
+        self.assertEqual(self.feed_posts(), [post])
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка переносит старые посты, отписка их убирает."""
+        post = Post.objects.create(author=self.author, text='Старый пост')
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': 'author'}))
+        self.assertEqual(self.feed_posts(), [post])
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': 'author'}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_posts(), [])
+
+    def test_deleted_post_leaves_feed(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        post.delete()
+        self.assertFalse(FeedEntry.objects.exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_celebrity_posts_merged_on_read(self):
+        """Посты авторов-«звёзд» не раскладываются, а подмешиваются."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        with override_settings(FEED_FANOUT_LIMIT=None):
+            Follow.objects.create(user=self.reader, author=other)
+            regular = [Post.objects.create(author=other, text=str(i))
+                       for i in range(6)]
+        famous = [Post.objects.create(author=self.author, text=str(i))
+                  for i in range(6)]
+        self.assertFalse(FeedEntry.objects.filter(
+            post__author=self.author).exists())
+        first_page = self.feed_posts()
+        self.assertEqual(first_page, (regular + famous)[::-1][:10])
+        cursor = self.client.get(
+            reverse('posts:follow_index')
+        ).context['page_obj'].paginator.next_cursor
+        response = self.client.get(
+            reverse('posts:follow_index') + f'?page=2&after={cursor}')
+        self.assertEqual(list(response.context['page_obj']), regular[:2][::-1])
+
+    def test_celebrity_posts_already_in_feed_not_duplicated(self):
+        """Пост, разложенный до того, как автор стал «звездой», не
+        повторяется и не укорачивает страницу."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=str(i))
+                 for i in range(12)]
+        # Дата в ленте разошлась с датой поста: дубли уже не соседние.
+        FeedEntry.objects.filter(post=posts[-1]).update(
+            pub_date=posts[0].pub_date)
+        with override_settings(FEED_FANOUT_LIMIT=0):
+            posts.append(Post.objects.create(author=self.author, text='new'))
+            first_page = self.feed_posts()
+            self.assertEqual(first_page, [posts[-1]] + posts[10:1:-1])
+            cursor = self.client.get(
+                reverse('posts:follow_index')
+            ).context['page_obj'].paginator.next_cursor
+            response = self.client.get(
+                reverse('posts:follow_index') + f'?page=2&after={cursor}')
+        page = response.context['page_obj']
+        self.assertEqual(list(page), [posts[1], posts[11], posts[0]])
+        self.assertFalse(page.has_next())
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_posts_skipped_as_celebrity_survive_unfollow(self):
+        """Пост, не разложенный, пока автор был «звездой», остаётся в
+        ленте, когда подписчиков снова становится немного."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertEqual(self.feed_posts(), [post])
+        later = Post.objects.create(author=self.author, text='Позже')
+        self.assertEqual(self.feed_posts(), [later, post])
@@ -0,0 +1,145 @@
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import object_cache
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Версии — в общем для процессов кэше, здесь файловом.
+        cls.directory = tempfile.mkdtemp()
+        cls.shared = override_settings(CACHES={
+            'default': settings.CACHES['default'],
+            'versions': {'BACKEND': 'django.core.cache.backends.filebased.'
+                                    'FileBasedCache',
+                         'LOCATION': cls.directory},
+        }, FRESHNESS_CACHE_ALIAS='versions')
+        cls.shared.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.shared.disable()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        caches['versions'].clear()
+        object_cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.post = Post.objects.create(author=self.author, group=self.group,
+                                        text='Текст')
+        self.other_post = Post.objects.create(author=self.reader,
+                                              text='Другой')
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', kwargs={'slug': 'group'}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': 'author'}),
+            'detail': reverse('posts:post_detail',
+                              kwargs={'post_id': self.post.pk}),
+        }
+
+    def etag(self, url, client=None):
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.has_header('Last-Modified'))
+        return response['ETag']
+
+    def test_not_modified_without_rendering(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                etag = self.etag(url)
+                with self.assertNumQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.content, b'')
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.urls['index'])
+        response = self.client.get(
+            self.urls['index'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_validators_depend_on_user_and_query(self):
+        reader = Client()
+        reader.force_login(self.reader)
+        url = self.urls['index']
+        self.assertNotEqual(self.etag(url), self.etag(url, reader))
+        self.assertNotEqual(self.etag(url), self.etag(f'{url}?page=2'))
+
+    def test_changes_update_validators(self):
+        etags = {name: self.etag(url) for name, url in self.urls.items()}
+        Comment.objects.create(post=self.other_post, author=self.reader,
+                               text='Не сюда')
+        self.assertEqual(self.etag(self.urls['detail']), etags['detail'])
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Сюда')
+        self.assertNotEqual(self.etag(self.urls['detail']), etags['detail'])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertNotEqual(self.etag(self.urls['profile']),
+                            etags['profile'])
+        self.assertEqual(self.etag(self.urls['index']), etags['index'])
+        self.post.text = 'Новый текст'
+        self.post.save()
+        for name in ('index', 'group'):
+            self.assertNotEqual(self.etag(self.urls[name]), etags[name])
+
+    def test_group_and_commenter_changes(self):
+        """Название группы и имя комментатора есть на странице поста."""
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        etag = self.etag(self.urls['detail'])
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertNotEqual(self.etag(self.urls['detail']), etag)
+        etag = self.etag(self.urls['detail'])
+        self.reader.set_password('secret')
+        self.reader.save()
+        self.assertEqual(self.etag(self.urls['detail']), etag)
+        self.reader.first_name = 'Читатель'
+        self.reader.save()
+        self.assertNotEqual(self.etag(self.urls['detail']), etag)
+
+    def test_csrf_cookie_in_post_validators(self):
+        """Форма комментария несёт CSRF-токен: без cookie 304 нет, с новой
+        cookie — новый ETag."""
+        reader = Client()
+        reader.force_login(self.reader)
+        url = self.urls['detail']
+        response = reader.get(url)
+        self.assertFalse(response.has_header('ETag'))
+        etag = self.etag(url, reader)
+        reader.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        self.assertNotEqual(self.etag(url, reader), etag)
+
+    @override_settings(FRESHNESS_CACHE_ALIAS='default')
+    def test_disabled_without_shared_cache(self):
+        """С кэшем в памяти процесса версии не хранятся и 304 не бывает."""
+        response = self.client.get(self.urls['index'])
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_missing_objects(self):
+        for url in (reverse('posts:profile', kwargs={'username': 'nobody'}),
+                    reverse('posts:post_detail', kwargs={'post_id': 999})):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='"x"')
+            self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,54 @@
+import tempfile
+
+from django.test import TestCase, override_settings
+
+from posts import benchmark
+from posts.forms import CommentForm, PostForm
+from posts.moderation import Automaton, find_forbidden
+
+
+class AutomatonTest(TestCase):
+    def test_whole_words_any_case(self):
+        automaton = Automaton(['кот', 'Рыжий пёс', 'he', 'she', 'hers'])
+        self.assertEqual(automaton.find('Тут КОТ!'), 'кот')
+        self.assertEqual(automaton.find('(кот)'), 'кот')
+        self.assertIsNone(automaton.find('котлета и скот'))
+        self.assertEqual(automaton.find('это рыжий,   ПЁС'), 'Рыжий пёс')
+        self.assertIsNone(automaton.find('рыжий и пёс'))
+        self.assertIsNone(automaton.find('ushers'))
+        self.assertEqual(automaton.find('and hers'), 'hers')
+        self.assertIsNone(Automaton([]).find('что угодно'))
+
+    def test_suffix_patterns(self):
+        """Совпадение находится и через суффиксную ссылку."""
+        automaton = Automaton(['a b c d', 'b c'])
+        self.assertEqual(automaton.find('a b c x'), 'b c')
+
+    @override_settings(MODERATION_WORDS=['Гоголь'])
+    def test_words_from_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as words:
+            words.write('# комментарий\nЧехов\n\nбелая гвардия\n')
+            words.flush()
+            with self.settings(MODERATION_WORDS_FILE=words.name):
+                self.assertEqual(find_forbidden('гоголь'), 'Гоголь')
+                self.assertEqual(find_forbidden('Белая  гвардия.'),
+                                 'белая гвардия')
+                self.assertEqual(find_forbidden('чехов'), 'Чехов')
+        self.assertIsNone(find_forbidden('Чехов'))
+
+
+class ModeratedFormsTest(TestCase):
+    def test_forms_reject_forbidden_words(self):
+        for form_class in (PostForm, CommentForm):
+            with self.subTest(form=form_class.__name__):
+                form = form_class(data={'text': 'Читаю Пушкина, «Пушкин»!'})
+                self.assertFalse(form.is_valid())
+                self.assertEqual(form.errors['text'], ['Forbidden word!'])
+                form = form_class(data={'text': 'Читаю Пушкина'})
+                self.assertTrue(form.is_valid())
+
+    def test_benchmark(self):
+        result = benchmark.measure_moderation(patterns=200,
+                                              lengths=(100, 1000))
+        self.assertEqual(result['patterns'], 200)
+        self.assertEqual(set(result['ns_per_char']), {'100', '1000'})
@@ -0,0 +1,114 @@
+import pickle
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase, override_settings
+
+from posts import object_cache
+from posts.models import Comment, Group, Post
+from posts.object_cache import LRU
+
+
+User = get_user_model()
+
+
+class LRUTest(TestCase):
+    def test_eviction_and_expiry(self):
+        lru = LRU(maxsize=2)
+        lru.set('a', 1, 60)
+        lru.set('b', 2, 60)
+        lru.get('a')
+        lru.set('c', 3, 60)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('d', 4, 0)
+        self.assertIsNone(lru.get('d'))
+
+
+class ObjectCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        object_cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.post = Post.objects.create(author=self.user, group=self.group,
+                                        text='Текст')
+
+    def test_read_through_tiers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.'
+                                       'locmem.LocMemCache'},
+                'objects': {'BACKEND': 'django.core.cache.backends.'
+                                       'filebased.FileBasedCache',
+                            'LOCATION': directory},
+            }, OBJECT_CACHE_ALIAS='objects'):
+                with self.assertNumQueries(1):
+                    self.assertEqual(object_cache.groups.get(slug='group'),
+                                     self.group)
+                with self.assertNumQueries(0):
+                    self.assertEqual(object_cache.groups.get(slug='group'),
+                                     self.group)
+                object_cache.groups.local.clear()
+                with self.assertNumQueries(0):
+                    object_cache.groups.get(slug='group')
+        self.assertEqual(object_cache.report()['posts.group'], {
+            'local': 1, 'shared': 1, 'miss': 1, 'hit_ratio': 0.667})
+
+    def test_no_shared_tier_in_process_memory(self):
+        """LocMemCache не общий: объект живёт только в LRU процесса."""
+        object_cache.groups.get(slug='group')
+        object_cache.groups.local.clear()
+        with self.assertNumQueries(1):
+            object_cache.groups.get(slug='group')
+        self.assertEqual(object_cache.report()['posts.group']['shared'], 0)
+
+    def test_only_public_author_fields(self):
+        """Хэш пароля и почта автора не кэшируются."""
+        self.user.email = 'author@example.com'
+        self.user.set_password('secret')
+        self.user.save()
+        for obj in (object_cache.users.get(pk=self.user.pk),
+                    object_cache.posts.get(pk=self.post.pk).author):
+            data = pickle.dumps(obj)
+            self.assertNotIn(b'author@example.com', data)
+            self.assertNotIn(self.user.password.encode(), data)
+
+    def test_cached_post_has_relations(self):
+        object_cache.posts.get(id=self.post.pk)
+        with self.assertNumQueries(0):
+            post = object_cache.posts.get(pk=self.post.pk)
+            self.assertEqual(post.author.username, 'author')
+            self.assertEqual(post.group.slug, 'group')
+
+    def test_changes_are_not_shared(self):
+        post = object_cache.posts.get(id=self.post.pk)
+        post.text = 'Изменён в представлении'
+        self.assertEqual(object_cache.posts.get(id=self.post.pk).text,
+                         'Текст')
+
+    def test_signals_invalidate(self):
+        object_cache.posts.get(id=self.post.pk)
+        object_cache.users.get(username='author')
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertIsNone(object_cache.users.get(username='author'))
+        self.assertEqual(object_cache.users.get(username='renamed'),
+                         self.user)
+        self.assertEqual(
+            object_cache.posts.get(id=self.post.pk).author.username,
+            'renamed')
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Комментарий')
+        self.assertEqual(
+            object_cache.posts.get(id=self.post.pk).comments_count, 1)
+        self.group.delete()
+        self.assertIsNone(object_cache.groups.get(slug='group'))
+        self.assertIsNone(object_cache.posts.get(id=self.post.pk).group)
+
+    def test_missing_object(self):
+        with self.assertRaises(Http404):
+            object_cache.groups.get_or_404(slug='missing')
@@ -0,0 +1,72 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+# «SCAN posts_post» без индекса — полный проход по таблице.
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?\w+$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedQueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        posts = [Post.objects.create(author=cls.author, group=cls.group,
+                                     text=f'Пост {i}') for i in range(15)]
+        cls.post = posts[0]
+        for i in range(3):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'Комментарий {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_urls(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:trending'),
+        ]
+        for url in urls[:4]:
+            page = self.client.get(url).context['page_obj']
+            urls.append(f'{url}?page=2&after={page.paginator.next_cursor}')
+        return urls
+
+    def plan(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_feed_views_use_indexes(self):
+        """Ленты не сканируют таблицы целиком и не сортируют во временном
+        B-дереве."""
+        for url in self.feed_urls():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            for query in queries.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                for step in self.plan(query):
+                    with self.subTest(url=url, sql=query['sql'], step=step):
+                        self.assertNotIn('TEMP B-TREE', step)
+                        self.assertIsNone(FULL_SCAN.search(step))
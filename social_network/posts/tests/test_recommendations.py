@@ -0,0 +1,64 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import recommendations
+from posts.models import Follow, Recommendation, UserStats
+from posts.recommendations import FollowGraph
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    def test_co_follow_scores(self):
+        # 1 и 2 читают 10; 2 и 3 ещё читают 20, а 3 — и 30.
+        graph = FollowGraph([(1, 10), (2, 10), (2, 20), (3, 10), (3, 20),
+                             (3, 30)])
+        self.assertEqual(graph.recommend(1, k=2), [(20, 2), (30, 1)])
+
+    def test_followed_and_self_excluded(self):
+        graph = FollowGraph([(1, 2), (2, 1), (2, 3), (1, 3)])
+        self.assertEqual(graph.recommend(1), [])
+
+    def test_popular_authors_fill_up(self):
+        graph = FollowGraph([(1, 10), (2, 10), (3, 20)])
+        self.assertEqual(graph.recommend(99, k=2), [(10, 0), (20, 0)])
+        self.assertEqual(graph.recommend(3), [(10, 0)])
+
+
+class RefreshTest(TestCase):
+    def setUp(self):
+        self.reader, self.neighbour, self.author, self.other = (
+            User.objects.create_user(username=name)
+            for name in ('reader', 'neighbour', 'author', 'other'))
+        Follow.objects.create(user=self.reader, author=self.other)
+        Follow.objects.create(user=self.neighbour, author=self.other)
+        Follow.objects.create(user=self.neighbour, author=self.author)
+
+    def stale(self):
+        return set(UserStats.objects.filter(recommendations_stale=True)
+                   .values_list('user_id', flat=True))
+
+    def test_refresh_only_stale_users(self):
+        self.assertEqual(recommendations.refresh(), 4)
+        self.assertEqual(self.stale(), set())
+        self.assertEqual(
+            [rec.author for rec in recommendations.for_user(self.reader)],
+            [self.author])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stale(), {self.reader.pk})
+        self.assertEqual(recommendations.refresh(), 1)
+        self.assertEqual(recommendations.for_user(self.reader), [])
+
+    def test_follow_page_reads_recommendations(self):
+        call_command('recommend_authors', '--all', stdout=StringIO())
+        self.assertTrue(Recommendation.objects.filter(
+            user=self.reader).exists())
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Кого почитать')
+        self.assertContains(response, reverse('posts:profile',
+                                              args=[self.author.username]))
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.models import Group, Post
+
+
+User = get_user_model()
+
+
+class SearchMixin:
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        self.other = User.objects.create_user(username='other')
+        self.group = Group.objects.create(title='Кошки', slug='cats',
+                                          description='Про кошек')
+        self.cat = Post.objects.create(
+            author=self.author, group=self.group,
+            text='Рыжий кот спит. Кот, кот и ещё раз кот!')
+        self.dog = Post.objects.create(author=self.other,
+                                       text='Собака и кот дружат')
+        Post.objects.create(author=self.other, text='Про погоду')
+
+    def found(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return list(response.context['page_obj'])
+
+    def test_ranked_results(self):
+        """Пост, где слово встречается чаще, стоит выше."""
+        self.assertEqual(self.found(q='КОТ'), [self.cat, self.dog])
+        self.assertEqual(self.found(q='кот собака'), [self.dog])
+        self.assertEqual(self.found(q='жираф'), [])
+        self.assertEqual(self.found(q='"кот*'), [self.cat, self.dog])
+
+    def test_filters(self):
+        self.assertEqual(self.found(q='кот', group='cats'), [self.cat])
+        self.assertEqual(self.found(q='кот', author='other'), [self.dog])
+        self.assertEqual(self.found(q='кот', author='nobody'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.dog.text = 'Собака и попугай'
+        self.dog.save()
+        self.assertEqual(self.found(q='кот'), [self.cat])
+        self.cat.delete()
+        self.assertEqual(self.found(q='кот'), [])
+
+    def test_rebuild(self):
+        Post.objects.filter(pk=self.dog.pk).update(text='Только жираф')
+        call_command('rebuild_search_index', stdout=open('/dev/null', 'w'))
+        self.assertEqual(self.found(q='жираф'), [self.dog])
+
+
+class Fts5SearchTest(SearchMixin, TestCase):
+    def test_backend(self):
+        self.assertIsInstance(search.get_backend(), search.Fts5Backend)
+
+
+@override_settings(POST_SEARCH_BACKEND='inverted')
+class InvertedIndexSearchTest(SearchMixin, TestCase):
+    def test_backend(self):
+        self.assertIsInstance(search.get_backend(),
+                              search.InvertedIndexBackend)
+
+    def test_ranked_in_database(self):
+        """Оценки считает база: в Python приходит только страница pk."""
+        backend = search.InvertedIndexBackend()
+        filters = {'group_id': None, 'author_id': None}
+        backend.search('кот', filters, 0, 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(backend.search('кот', filters, 1, 1),
+                             [self.dog.pk])
+        self.assertEqual(len(queries), 1)
+        sql = queries.captured_queries[0]['sql']
+        self.assertIn('GROUP BY', sql)
+        self.assertIn('LIMIT 1', sql)
+        self.assertEqual(backend.count('кот', filters), 2)
@@ -0,0 +1,52 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import object_cache
+from posts.fragments import SEPARATOR
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class StreamingFeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        object_cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        for number in range(3):
+            Post.objects.create(author=self.user, group=self.group,
+                                text=f'Пост номер {number}')
+        self.client.force_login(self.user)
+
+    def test_same_page_in_chunks(self):
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', args=['group']),
+                    reverse('posts:profile', args=['author']),
+                    reverse('posts:trending')):
+            with self.subTest(url=url):
+                cache.clear()
+                expected = self.client.get(url).content
+                cache.clear()
+                with self.settings(STREAMING_FEEDS=True):
+                    response = self.client.get(url)
+                self.assertTrue(response.streaming)
+                chunks = list(response.streaming_content)
+                self.assertEqual(b''.join(chunks), expected)
+
+    @override_settings(STREAMING_FEEDS=True)
+    def test_header_before_posts(self):
+        response = self.client.get(reverse('posts:index'))
+        head, *posts = [chunk.decode()
+                        for chunk in response.streaming_content]
+        self.assertIn('<header>', head)
+        self.assertNotIn('Пост номер', head)
+        self.assertIn('Пост номер 2', posts[0])
+        self.assertTrue(posts[1].startswith(SEPARATOR))
+        # Контекст-процессор year работает и в потоковом режиме.
+        self.assertIn(f'© {datetime.date.today().year}', posts[-1])
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TransactionTestCase, override_settings
+
+from core import jobs
+from core.models import Job
+from posts import search
+from posts.models import Comment, FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(JOBS_EAGER=False)
+class WorkerModeTest(TransactionTestCase):
+    """Без режима eager побочные эффекты ждут воркера.
+
+    Задачи ставятся после коммита, поэтому тест без обёртки-транзакции.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author',
+                                               email='author@example.com')
+        self.reader = User.objects.create_user(username='reader')
+
+    def test_follow_and_post_fan_out_after_worker(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Рыжий кот')
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(list(search.SearchResults('рыжий')[0:10]), [])
+        jobs.work_off()
+        self.assertTrue(FeedEntry.objects.filter(user=self.reader,
+                                                 post=post).exists())
+        self.assertEqual(list(search.SearchResults('рыжий')[0:10]), [post])
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
+
+    def test_unfollow_before_worker(self):
+        Post.objects.create(author=self.author, text='Пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.filter(user=self.reader).delete()
+        jobs.work_off()
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_comment_notifies_author_once(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader,
+                               text='Отличный пост')
+        Comment.objects.create(post=post, author=self.author,
+                               text='Спасибо')
+        self.assertEqual(mail.outbox, [])
+        jobs.work_off()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['author@example.com'])
+        self.assertIn('Отличный пост', mail.outbox[0].body)
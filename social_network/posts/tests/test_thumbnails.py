@@ -0,0 +1,78 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import fragments, thumbnails
+from posts.models import Post
+
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails._enqueued.clear()
+        self.user = User.objects.create_user(username='photographer')
+        self.post = Post.objects.create(
+            text='Пост с картинкой', author=self.user,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                     content_type='image/gif'))
+
+    def test_feed_shows_placeholder_without_image_processing(self):
+        """Лента не рисует миниатюры, а показывает заглушку."""
+        with mock.patch('sorl.thumbnail.base.ThumbnailBackend.'
+                        '_create_thumbnail') as create:
+            response = self.client.get(reverse('posts:index'))
+        create.assert_not_called()
+        self.assertContains(response, 'bg-light')
+        self.assertNotContains(response, 'card-img my-2" src=')
+        self.post.refresh_from_db()
+        self.assertIsNone(
+            cache.get(fragments.fragment_key(self.post, '11')))
+
+    def test_generated_thumbnail_replaces_placeholder(self):
+        self.client.get(reverse('posts:index'))
+        thumbnails.schedule(self.post.image.name, self.post.pk)
+        for geometry, options in thumbnails.SIZES:
+            self.assertIsNotNone(thumbnails.ready_thumbnail(
+                self.post.image, geometry, **options))
+        for url in (reverse('posts:index'),
+                    reverse('posts:post_detail',
+                            kwargs={'post_id': self.post.pk})):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'card-img my-2" src=')
+                self.assertNotContains(response, 'bg-light')
+
+    @override_settings(JOBS_EAGER=False, POST_THUMBNAIL_WORKERS=1)
+    def test_render_enqueues_pending_thumbnail_once(self):
+        """Повторный рендер заглушки не пишет задачу в очередь снова."""
+        with mock.patch('posts.thumbnails.jobs.defer') as defer:
+            self.client.get(reverse('posts:index'))
+            self.client.get(reverse('posts:index'))
+        defer.assert_called_once_with(
+            'posts.thumbnails', self.post.image.name, self.post.pk,
+            key=f'thumbnails:{self.post.image.name}')
@@ -0,0 +1,109 @@
+import io
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import search, transfer
+from posts.models import Comment, FeedEntry, Follow, Group, Post, UserStats
+
+
+User = get_user_model()
+
+
+class TransferTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.posts = [
+            Post.objects.create(author=self.author, group=self.group,
+                                text='Первый, "с кавычками"\nи строкой'),
+            Post.objects.create(author=self.author, text='Второй'),
+        ]
+        Comment.objects.create(post=self.posts[0], author=self.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def dump(self, kind, fmt):
+        output = io.StringIO()
+        transfer.write(transfer.export_rows(kind, chunk_size=1), kind,
+                       output, fmt)
+        return output.getvalue()
+
+    def test_round_trip(self):
+        for fmt in transfer.FORMATS:
+            with self.subTest(format=fmt):
+                dumps = {kind: self.dump(kind, fmt)
+                         for kind in transfer.KINDS}
+                posts = list(Post.objects.order_by('pk').values())
+                Group.objects.all().delete()
+                Post.objects.all().delete()
+                Follow.objects.all().delete()
+                for kind in ('groups', 'posts', 'comments', 'follows'):
+                    loaded = transfer.load(
+                        transfer.read(io.StringIO(dumps[kind]), fmt), kind,
+                        batch_size=1)
+                    transfer.rebuild(kind)
+                    self.assertGreater(loaded, 0)
+                self.assertEqual(
+                    list(Post.objects.order_by('pk').values()), posts)
+                self.assertEqual(UserStats.objects.get(
+                    user=self.author).posts_count, 2)
+                self.assertEqual(FeedEntry.objects.filter(
+                    user=self.reader).count(), 2)
+                self.assertEqual(
+                    search.SearchResults('второй')[0:10], [self.posts[1]])
+
+    def test_import_skips_existing_rows(self):
+        dump = self.dump('posts', 'ndjson')
+        self.assertEqual(transfer.load(
+            transfer.read(io.StringIO(dump), 'ndjson'), 'posts'), 2)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_dates_and_ids_kept(self):
+        """Даты auto_now берутся из файла, а новые посты получают
+        свободный id."""
+        dump = self.dump('posts', 'ndjson')
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', 'updated_at'))
+        Post.objects.all().delete()
+        transfer.load(transfer.read(io.StringIO(dump), 'ndjson'), 'posts')
+        self.assertEqual(list(Post.objects.order_by('pk').values_list(
+            'pub_date', 'updated_at')), dates)
+        post = Post.objects.create(author=self.author, text='Третий')
+        self.assertGreater(post.pk, self.posts[-1].pk)
+        self.assertNotEqual(post.pub_date, dates[0][0])
+
+    def test_commands(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'comments.csv')
+            call_command('export_data', 'comments', output=path,
+                         stderr=io.StringIO())
+            Comment.objects.all().delete()
+            call_command('import_data', 'comments', path,
+                         stdout=io.StringIO())
+        post = Post.objects.get(pk=self.posts[0].pk)
+        self.assertEqual(post.comments.get().text, 'Комментарий')
+        self.assertEqual(post.comments_count, 1)
+
+    def test_deferred_rebuild(self):
+        """После загрузки без пересчёта rebuild_derived догоняет всё."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.ndjson')
+            call_command('export_data', 'posts', output=path,
+                         stderr=io.StringIO())
+            Post.objects.all().delete()
+            UserStats.objects.update(posts_count=0)
+            call_command('import_data', 'posts', path, no_rebuild=True,
+                         stdout=io.StringIO())
+        self.assertEqual(UserStats.objects.get(
+            user=self.author).posts_count, 0)
+        call_command('rebuild_derived', stdout=io.StringIO())
+        self.assertEqual(UserStats.objects.get(
+            user=self.author).posts_count, 2)
+        self.assertEqual(FeedEntry.objects.filter(
+            user=self.reader).count(), 2)
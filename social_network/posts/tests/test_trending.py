@@ -0,0 +1,80 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Follow, Group, GroupTrend, Post, PostTrend
+
+User = get_user_model()
+
+
+class TrendingTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Котики', slug='cats',
+                                          description='Описание')
+        self.quiet = Post.objects.create(author=self.author, text='Тихий')
+        self.busy = Post.objects.create(author=self.author, text='Обсуждаемый',
+                                        group=self.group)
+
+    def scores(self):
+        return dict(PostTrend.objects.values_list('post_id', 'score'))
+
+    def test_comments_raise_post_and_group(self):
+        self.assertEqual(trending.post_ids(), [self.busy.pk, self.quiet.pk])
+        Comment.objects.create(post=self.quiet, author=self.reader,
+                               text='Первый')
+        self.assertEqual(trending.post_ids(), [self.quiet.pk, self.busy.pk])
+        for text in ('Раз', 'Два'):
+            Comment.objects.create(post=self.busy, author=self.reader,
+                                   text=text)
+        self.assertEqual(trending.post_ids(), [self.busy.pk, self.quiet.pk])
+        self.assertEqual(trending.groups(), [self.group])
+
+    def test_old_activity_decays(self):
+        now = timezone.now()
+        # Двое суток — 8 периодов полураспада: сто комментариев тогда
+        # весят меньше двух сейчас.
+        old = now - datetime.timedelta(days=2)
+        for _ in range(100):
+            trending.record(self.quiet.pk, None, 1, old)
+        trending.record(self.busy.pk, None, 2, now)
+        self.assertEqual(trending.post_ids()[0], self.busy.pk)
+
+    def test_far_apart_events(self):
+        """Событие на тысячи периодов позже просто заменяет оценку."""
+        later = timezone.now() + datetime.timedelta(
+            seconds=trending.half_life() * 5000)
+        trending.record(self.quiet.pk, None, 1, later)
+        self.assertEqual(self.scores()[self.quiet.pk],
+                         trending.log_weight(1, later))
+
+    def test_followers_weigh_new_post(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        popular = Post.objects.create(author=self.author, text='Популярный')
+        other = User.objects.create_user(username='other')
+        lonely = Post.objects.create(author=other, text='Одинокий')
+        scores = self.scores()
+        self.assertGreater(scores[popular.pk], scores[lonely.pk])
+
+    def test_rebuild_matches_incremental(self):
+        Comment.objects.create(post=self.busy, author=self.reader,
+                               text='Комментарий')
+        before = self.scores()
+        group_before = GroupTrend.objects.get(pk=self.group.pk).score
+        trending.rebuild()
+        for pk, score in self.scores().items():
+            self.assertAlmostEqual(score, before[pk], places=6)
+        self.assertAlmostEqual(GroupTrend.objects.get(pk=self.group.pk).score,
+                               group_before, places=6)
+
+    def test_page(self):
+        response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.busy, self.quiet])
+        self.assertContains(response, reverse('posts:group_list',
+                                              args=['cats']))
@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from http import HTTPStatus
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -9,6 +10,7 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 
+from posts import thumbnails
 from posts.models import Post, Group, Comment, Follow
 
 
@@ -16,7 +18,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
 class PostTest(TestCase):
     @classmethod
     def tearDownClass(cls):
@@ -24,6 +26,7 @@ class PostTest(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.small_gif = (
             b'\x47\x49\x46\x38\x39\x61\x02\x00'
             b'\x01\x00\x80\x00\x00\x00\x00\x00'
@@ -117,6 +120,22 @@ class PostTest(TestCase):
             self.assertEqual(post_text_0[value], expected)
         self.assertTrue(response.context['form'], 'форма получена')
 
+    def test_post_detail_query_budget(self):
+        """Число запросов post_detail не зависит от числа комментариев."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        other = User.objects.create_user(username='commentator')
+        # Первый рендер заполняет кэш поиска миниатюры.
+        self.guest_client.get(url)
+        for budget_check in range(2):
+            Comment.objects.bulk_create(
+                Comment(post=self.post, author=other, text=f'Коммент {i}')
+                for i in range(20))
+            # Сессия, пользователь, пост с автором и группой, комментарии.
+            with self.assertNumQueries(4):
+                self.authorized_client.get(url)
+            with self.assertNumQueries(2):
+                self.guest_client.get(url)
+
     def test_post_create_correct_context(self):
         """Шаблон post_create сформирован с правильным контекстом."""
         response = self.authorized_client.post(reverse('posts:post_create'))
@@ -153,21 +172,66 @@ class PostTest(TestCase):
         group = Post.objects.filter(group=self.group).count()
         self.assertEqual(group, posts_count)
 
-    def test_cache_index(self):
-        """Проверка хранения и очистки кэша для index."""
-        response = self.authorized_client.get(reverse('posts:index'))
-        posts = response.content
-        Post.objects.create(
-            text='test_new_post',
-            author=self.user,
-        )
-        response_old = self.authorized_client.get(reverse('posts:index'))
-        old_posts = response_old.content
-        self.assertEqual(old_posts, posts)
-        cache.clear()
-        response_new = self.authorized_client.get(reverse('posts:index'))
-        new_posts = response_new.content
-        self.assertNotEqual(old_posts, new_posts)
+    def test_post_fragment_cache(self):
+        """Фрагмент поста берётся из кэша и сбрасывается при правке."""
+        url = reverse('posts:index')
+        # Фрагмент с заглушкой вместо миниатюры не кэшируется.
+        thumbnails.schedule(self.post.image.name, self.post.pk)
+        self.authorized_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Мимо сигналов')
+        for address in (url, reverse('posts:group_list',
+                                     kwargs={'slug': self.group.slug})):
+            with self.subTest(address=address):
+                response = self.authorized_client.get(address)
+                self.assertContains(response, self.post.text)
+        self.post.text = 'Отредактированный текст'
+        self.post.save()
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Отредактированный текст')
+        new_post = Post.objects.create(text='test_new_post', author=self.user)
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        self.assertContains(response, 'test_new_post')
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(text='Популярный пост', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Коммент {i}')
+            for i in range(25))
+
+    def test_post_detail_renders_first_comments_page(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'js-more-comments')
+
+    def test_comments_endpoint_returns_next_page(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        first_page = response.context['comments']
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        cursor = first_page.paginator.next_cursor
+        # Пост уже в кэше объектов, остаётся страница комментариев.
+        with self.assertNumQueries(1):
+            response = self.client.get(f'{url}?after={cursor}')
+        self.assertTemplateUsed(response, 'posts/comment_list.html')
+        second_page = response.context['comments']
+        self.assertEqual(len(second_page), 5)
+        self.assertFalse(second_page.has_next())
+        self.assertFalse(set(first_page) & set(second_page))
+        self.assertNotContains(response, 'js-more-comments')
+
+    def test_comments_endpoint_unknown_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
 
 
 class FollowViewsTest(TestCase):
@@ -304,3 +368,48 @@ class PaginatorViewsTest(TestCase):
         for tested_url in list_urls.keys():
             response = self.client.get(tested_url)
             self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_cursor_pages_do_not_overlap(self):
+        """Переход по курсору даёт следующую страницу без повторов."""
+        url = reverse("posts:group_list", kwargs={"slug": "test_slug2"})
+        first_page = self.client.get(url).context['page_obj']
+        cursor = first_page.paginator.next_cursor
+        self.assertIsNotNone(cursor)
+        second_page = self.client.get(
+            f'{url}?page=2&after={cursor}').context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertEqual(second_page.number, 2)
+        self.assertFalse(second_page.has_next())
+        self.assertFalse(set(first_page) & set(second_page))
+        back = second_page.paginator.previous_cursor
+        previous_page = self.client.get(
+            f'{url}?page=1&before={back}').context['page_obj']
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_cursor_page_query_count(self):
+        """Страница по курсору не считает записи и не использует OFFSET."""
+        url = reverse("posts:group_list", kwargs={"slug": "test_slug2"})
+        cursor = self.client.get(url).context['page_obj'].paginator.next_cursor
+        # Группа уже в кэше объектов, остаётся страница постов.
+        with self.assertNumQueries(1) as queries:
+            self.client.get(f'{url}?page=2&after={cursor}')
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_out_of_range_page_and_cursor(self):
+        """Огромный номер страницы — первая страница, битый курсор — номер."""
+        url = reverse("posts:group_list", kwargs={"slug": "test_slug2"})
+        cases = {
+            f'page={10 ** 30}': (1, 10),
+            f'page=2&after=1.{10 ** 30}': (2, 3),
+            f'page=2&before=1.{10 ** 30}': (2, 3),
+            'page=2&after=1.-5': (2, 3),
+        }
+        for query, (number, size) in cases.items():
+            with self.subTest(query=query):
+                response = self.client.get(f'{url}?{query}')
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                page = response.context['page_obj']
+                self.assertEqual(page.number, number)
+                self.assertEqual(len(page), size)
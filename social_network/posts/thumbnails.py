@@ -0,0 +1,129 @@
+"""Заблаговременная генерация миниатюр картинок постов.
+
+Миниатюры нужных шаблонам размеров создаются в пуле потоков после
+сохранения поста. Шаблоны только ищут готовую миниатюру и, пока её нет,
+показывают заглушку.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import jobs, metrics
+
+from . import changes, freshness
+from .models import Post
+
+
+logger = logging.getLogger(__name__)
+
+# Размеры, которые используют posts_list.html и post_detail.html.
+SIZES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+_executor = None
+_lock = threading.Lock()
+_in_flight = set()
+# Имена, уже отправленные в очередь runworker этим процессом.
+_enqueued = set()
+ENQUEUED_LIMIT = 10000
+
+GENERATION_TIME = metrics.histogram(
+    'post_thumbnail_generation_seconds', 'Время генерации миниатюр поста.')
+
+
+def workers():
+    # 0 — генерировать сразу в вызывающем потоке (тесты, отладка).
+    return getattr(settings, 'POST_THUMBNAIL_WORKERS', 2)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers(),
+                                           thread_name_prefix='thumbnails')
+        return _executor
+
+
+def ready_thumbnail(file_, geometry, **options):
+    """Готовая миниатюра из хранилища sorl или None; ничего не рисует."""
+    if not file_:
+        return None
+    source = ImageFile(file_)
+    backend = default.backend
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def create(name, post_id):
+    """Рисует все размеры и отмечает пост изменённым."""
+    started = time.perf_counter()
+    for geometry, options in SIZES:
+        get_thumbnail(name, geometry, **options)
+    GENERATION_TIME.observe(time.perf_counter() - started)
+    # Новая версия поста — новый ключ фрагмента, уже с миниатюрой.
+    changes.touch_posts(Post.objects.filter(pk=post_id))
+    freshness.touch('posts', f'post:{post_id}')
+
+
+def generate(name, post_id):
+    try:
+        create(name, post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    finally:
+        with _lock:
+            _in_flight.discard(name)
+
+
+def _generate_in_worker(name, post_id):
+    try:
+        generate(name, post_id)
+    finally:
+        # У каждого потока пула своё соединение с базой.
+        connection.close()
+
+
+def schedule(name, post_id):
+    """Ставит генерацию в очередь, если она ещё не запущена."""
+    if not name:
+        return
+    if not jobs.eager():
+        # Миниатюры рисует runworker, ключ не даёт поставить их дважды.
+        # Рендер ленты с заглушкой не должен каждый раз писать в базу:
+        # повторная вставка упирается в ключ, а неудачная задача так и
+        # остаётся в очереди.
+        with _lock:
+            if name in _enqueued:
+                return
+            if len(_enqueued) >= ENQUEUED_LIMIT:
+                _enqueued.clear()
+            _enqueued.add(name)
+        jobs.defer('posts.thumbnails', name, post_id,
+                   key=f'thumbnails:{name}')
+        return
+    with _lock:
+        if name in _in_flight:
+            return
+        _in_flight.add(name)
+    if workers():
+        _get_executor().submit(_generate_in_worker, name, post_id)
+    else:
+        generate(name, post_id)
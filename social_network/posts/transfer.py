@@ -0,0 +1,160 @@
+"""Выгрузка и загрузка данных posts в NDJSON и CSV.
+
+Выгрузка читает таблицу курсором пачками, поэтому память не зависит
+от числа строк. Загрузка пишет пачками многострочным INSERT: сигналы при
+этом не срабатывают, и счётчики, ленты и поисковый индекс
+перестраиваются один раз после загрузки.
+"""
+import csv
+import datetime
+import json
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.utils import batched
+
+from . import counters, feed, search, trending
+from .models import Comment, Follow, Group, Post, User
+
+
+KINDS = {
+    'groups': (Group, ('id', 'title', 'slug', 'description')),
+    'posts': (Post, ('id', 'author_id', 'group_id', 'text', 'image',
+                     'pub_date', 'updated_at')),
+    'comments': (Comment, ('id', 'post_id', 'author_id', 'text',
+                           'pub_date', 'updated_at')),
+    'follows': (Follow, ('id', 'user_id', 'author_id')),
+}
+FORMATS = ('ndjson', 'csv')
+CHUNK_SIZE = 2000
+
+
+class Encoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder отрезает микросекунды, а по ним сортируются
+        # ленты и строятся курсоры.
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def auto_dates(model):
+    """Поля auto_now и auto_now_add: save() ставит в них текущее время."""
+    return [field.attname for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now', False)
+            or getattr(field, 'auto_now_add', False)]
+
+
+def export_rows(kind, chunk_size=CHUNK_SIZE):
+    model, fields = KINDS[kind]
+    return (model.objects.order_by('pk').values(*fields)
+            .iterator(chunk_size=chunk_size))
+
+
+def write(rows, kind, output, fmt):
+    """Пишет строки в файл и возвращает их число."""
+    fields = KINDS[kind][1]
+    total = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(output, fieldnames=fields)
+        writer.writeheader()
+        for total, row in enumerate(rows, 1):
+            writer.writerow(row)
+    else:
+        for total, row in enumerate(rows, 1):
+            output.write(json.dumps(row, cls=Encoder,
+                                    ensure_ascii=False) + '\n')
+    return total
+
+
+def read(source, fmt):
+    if fmt == 'csv':
+        return csv.DictReader(source)
+    return (json.loads(line) for line in source if line.strip())
+
+
+def _build(model, fields, row):
+    values = {}
+    for name in fields:
+        field = model._meta.get_field(name[:-3] if name.endswith('_id')
+                                      else name)
+        value = row.get(name)
+        # В CSV нет NULL: пустая строка в nullable-колонке — это NULL.
+        if value == '' and field.null:
+            value = None
+        values[field.attname] = field.to_python(value)
+    return model(**values)
+
+
+def load(rows, kind, batch_size=CHUNK_SIZE):
+    """Вставляет строки пачками; уже существующие ключи пропускаются."""
+    model, fields = KINDS[kind]
+    objects = (_build(model, fields, row) for row in rows)
+    total = 0
+    for batch in batched(objects, batch_size):
+        with transaction.atomic():
+            insert(model, batch)
+        total += len(batch)
+    reset_sequences(model)
+    return total
+
+
+def insert(model, batch):
+    """Многострочный INSERT с явными id и датами auto_now из объектов.
+
+    Строки с уже занятыми id пропускаются самой базой (INSERT OR IGNORE
+    в SQLite, ON CONFLICT DO NOTHING в PostgreSQL). Пустые даты
+    заполняются текущим временем, как это сделал бы save().
+    """
+    fields = model._meta.local_concrete_fields
+    dates = set(auto_dates(model))
+    now = timezone.now()
+    ops = connection.ops
+    head = '%s %s (%s) VALUES ' % (
+        ops.insert_statement(ignore_conflicts=True),
+        ops.quote_name(model._meta.db_table),
+        ', '.join(ops.quote_name(field.column) for field in fields))
+    row = '(%s)' % ', '.join(['%s'] * len(fields))
+    suffix = ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)
+    size = max(ops.bulk_batch_size(fields, batch), 1)
+    with connection.cursor() as cursor:
+        for chunk in batched(batch, size):
+            params = []
+            for obj in chunk:
+                for field in fields:
+                    value = getattr(obj, field.attname)
+                    if value is None and field.attname in dates:
+                        value = now
+                    params.append(field.get_db_prep_save(value, connection))
+            cursor.execute(
+                head + ', '.join([row] * len(chunk)) + ' ' + suffix, params)
+
+
+def reset_sequences(model):
+    """Счётчик id после вставки явных ключей, иначе следующий INSERT в
+    PostgreSQL получит занятый id."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def rebuild(*kinds):
+    """Производные данные, которые загрузка не обновила.
+
+    Без аргументов перестраивается всё: так догоняют загрузки с
+    --no-rebuild.
+    """
+    kinds = set(kinds or KINDS)
+    if kinds & {'posts', 'follows'}:
+        counters.recount_users(User.objects.all())
+        feed.rebuild()
+    if 'posts' in kinds:
+        search.get_backend().rebuild()
+    if 'comments' in kinds:
+        counters.recount_posts(Post.objects.all())
+    if kinds & {'posts', 'comments'}:
+        trending.rebuild()
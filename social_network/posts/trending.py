@@ -0,0 +1,142 @@
+"""Популярные посты и группы: оценки с экспоненциальным затуханием.
+
+Публикация поста добавляет к его оценке и оценке группы вес, растущий с
+числом подписчиков автора, каждый комментарий — единицу. Вес события
+вдвое уменьшается за TRENDING_HALF_LIFE секунд. Хранится логарифм суммы
+весов, приведённых к фиксированной эпохе: log2 Σ w·2^((t − EPOCH) / H).
+Затухание делит все оценки на одно и то же число и порядок не меняет,
+поэтому событие обновляет одну строку, а лучшие посты читаются проходом
+по индексу оценки без пересчёта.
+"""
+import datetime
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Greatest, Least, Log, Power
+from django.utils import timezone
+
+from .models import Comment, GroupTrend, Post, PostTrend, UserStats
+
+
+EPOCH = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+TRENDING_POSTS = 100
+TRENDING_GROUPS = 10
+# Через столько периодов полураспада вес события меньше миллионной.
+HORIZON = 20
+COMMENT_WEIGHT = 1
+# 2^-60 уже не меняет double рядом с единицей, а power() в PostgreSQL на
+# разрыве больше ~1074 падает с ошибкой underflow.
+MAX_GAP = 60.0
+
+
+def half_life():
+    return getattr(settings, 'TRENDING_HALF_LIFE', 6 * 3600)
+
+
+def log_weight(weight, when):
+    return math.log2(weight) + (when - EPOCH).total_seconds() / half_life()
+
+
+def post_weight(followers):
+    return 1 + math.log2(1 + followers)
+
+
+def _log_add(value):
+    """score = log2(2^score + 2^value) без переполнения."""
+    value = Value(value, output_field=FloatField())
+    high = Greatest(F('score'), value)
+    low = Least(F('score'), value)
+    gap = Greatest(low - high, Value(-MAX_GAP))
+    return high + Log(Value(2.0), Value(1.0) + Power(Value(2.0), gap))
+
+
+def _bump(model, pk, value):
+    rows = model.objects.filter(pk=pk)
+    if rows.update(score=_log_add(value)):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(pk=pk, score=value)
+    except IntegrityError:
+        # Строку успел создать конкурентный запрос.
+        rows.update(score=_log_add(value))
+
+
+def record(post_id, group_id, weight, when):
+    value = log_weight(weight, when)
+    _bump(PostTrend, post_id, value)
+    if group_id is not None:
+        _bump(GroupTrend, group_id, value)
+
+
+def record_post(post):
+    followers = (UserStats.objects.filter(user_id=post.author_id)
+                 .values_list('followers_count', flat=True).first() or 0)
+    record(post.pk, post.group_id, post_weight(followers), post.pub_date)
+
+
+def record_comment(comment, group_id):
+    record(comment.post_id, group_id, COMMENT_WEIGHT, comment.pub_date)
+
+
+def post_ids():
+    """Лучшие посты — только pk, одним проходом по индексу оценки."""
+    return list(PostTrend.objects.order_by('-score', '-post_id')
+                .values_list('post_id', flat=True)[:TRENDING_POSTS])
+
+
+def posts_in_order(ids):
+    posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def groups():
+    return [trend.group for trend in GroupTrend.objects.select_related(
+        'group').order_by('-score')[:TRENDING_GROUPS]]
+
+
+def _log_sum(values):
+    high = max(values)
+    return high + math.log2(sum(2 ** (value - high) for value in values))
+
+
+def rebuild():
+    """Оценки заново по событиям последних HORIZON периодов.
+
+    Нужна после импорта данных и смены TRENDING_HALF_LIFE; заодно
+    удаляет оценки, которые уже ничего не весят.
+    """
+    since = timezone.now() - datetime.timedelta(
+        seconds=half_life() * HORIZON)
+    by_post, by_group = defaultdict(list), defaultdict(list)
+    followers = dict(UserStats.objects.values_list('user_id',
+                                                   'followers_count'))
+    events = [
+        (pk, group_id, post_weight(followers.get(author_id, 0)), pub_date)
+        for pk, group_id, author_id, pub_date in Post.objects.filter(
+            pub_date__gte=since).values_list('pk', 'group_id', 'author_id',
+                                             'pub_date').iterator()
+    ] + [
+        (post_id, group_id, COMMENT_WEIGHT, pub_date)
+        for post_id, group_id, pub_date in Comment.objects.filter(
+            pub_date__gte=since).values_list('post_id', 'post__group_id',
+                                             'pub_date').iterator()
+    ]
+    for post_id, group_id, weight, when in events:
+        value = log_weight(weight, when)
+        by_post[post_id].append(value)
+        if group_id is not None:
+            by_group[group_id].append(value)
+    with transaction.atomic():
+        PostTrend.objects.all().delete()
+        GroupTrend.objects.all().delete()
+        PostTrend.objects.bulk_create(
+            [PostTrend(post_id=pk, score=_log_sum(values))
+             for pk, values in by_post.items()], batch_size=1000)
+        GroupTrend.objects.bulk_create(
+            [GroupTrend(group_id=pk, score=_log_sum(values))
+             for pk, values in by_group.items()], batch_size=1000)
+    return len(by_post), len(by_group)
@@ -1,40 +1,60 @@
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import render, get_object_or_404, redirect
+from django.views.decorators.http import condition
 
-from .models import Post, Group, Comment, Follow
+from core.paginator import CursorPaginator
+from . import feed, freshness, object_cache, recommendations, trending
+from .search import SearchResults
+from .streaming import render_feed
+from .models import Post, Group, Comment, Follow, UserStats
 from .forms import PostForm, CommentForm
 
 LAST_POSTS = 10
+COMMENTS_PER_PAGE = 20
+SEARCH_RESULTS = 10
 
 
-def paginator_group(request, post_list):
-    paginator = Paginator(post_list, LAST_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def attach_stats(user):
+    # Счётчики меняются часто, в кэше объектов их нет.
+    stats = UserStats.objects.filter(user_id=user.pk).first()
+    if stats is not None:
+        user.stats = stats
+
+
+def paginator_group(request, post_list, **keys):
+    paginator = CursorPaginator(post_list, LAST_POSTS, **keys)
+    page_obj = paginator.get_page(request.GET.get('page'),
+                                  after=request.GET.get('after'),
+                                  before=request.GET.get('before'))
     return page_obj
 
 
+@condition(**freshness.scoped(freshness.feed_scopes))
 def index(request):
     template = 'posts/index.html'
     post_list = Post.objects.select_related('author', 'group').all()
     page_obj = paginator_group(request, post_list)
-    return render(request, template, {'page_obj': page_obj})
+    return render_feed(request, template, {'page_obj': page_obj})
 
 
+@condition(**freshness.scoped(freshness.feed_scopes))
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
+    group = object_cache.groups.get_or_404(slug=slug)
     post_list = group.posts.select_related('author').all()
     page_obj = paginator_group(request, post_list)
     context = {'group': group,
                'page_obj': page_obj}
-    return render(request, template, context)
+    return render_feed(request, template, context)
 
 
+@condition(**freshness.scoped(freshness.profile_scopes))
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = object_cache.users.get_or_404(username=username)
+    attach_stats(author)
     post_list = author.posts.select_related('group').all()
     page_obj = paginator_group(request, post_list)
     following = (request.user.is_authenticated
@@ -45,12 +65,46 @@ def profile(request, username):
         'author': author,
         'following': following
     }
-    return render(request, 'posts/profile.html', context)
+    return render_feed(request, 'posts/profile.html', context)
+
+
+def trending_posts(request):
+    page_obj = Paginator(trending.post_ids(), LAST_POSTS).get_page(
+        request.GET.get('page'))
+    page_obj.object_list = trending.posts_in_order(page_obj.object_list)
+    context = {'page_obj': page_obj, 'groups': trending.groups()}
+    return render_feed(request, 'posts/trending.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    group = request.GET.get('group')
+    author = request.GET.get('author')
+    filters = {}
+    if group:
+        filters['group_id'] = (Group.objects.filter(slug=group)
+                               .values_list('pk', flat=True).first() or 0)
+    if author:
+        filters['author_id'] = (User.objects.filter(username=author)
+                                .values_list('pk', flat=True).first() or 0)
+    paginator = Paginator(SearchResults(query, **filters), SEARCH_RESULTS)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    params = request.GET.copy()
+    params.pop('page', None)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'query_string': params.urlencode(),
+    }
+    return render_feed(request, 'posts/search.html', context)
 
 
+@condition(**freshness.scoped(freshness.post_scopes, forms=True))
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = object_cache.posts.get_or_404(id=post_id)
+    attach_stats(post.author)
+    comments = CursorPaginator(post.comments.select_related('author'),
+                               COMMENTS_PER_PAGE).get_page()
     form = CommentForm()
     context = {
         'post': post,
@@ -60,9 +114,22 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    post = object_cache.posts.get_or_404(id=post_id)
+    paginator = CursorPaginator(post.comments.select_related('author'),
+                                COMMENTS_PER_PAGE)
+    comments = paginator.get_page(after=request.GET.get('after'))
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, 'posts/comment_list.html', context)
+
+
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = object_cache.posts.get_or_404(id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -73,15 +140,17 @@ def add_comment(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def delete_comment(request, comment_id, post_id):
     comment = get_object_or_404(Comment, id=comment_id)
-    post = get_object_or_404(Post, id=post_id)
+    post = object_cache.posts.get_or_404(id=post_id)
     if comment.author == request.user:
         comment.delete()
     return redirect('posts:post_detail', post.id)
 
 
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
@@ -94,6 +163,8 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
+    # Форма сохраняет все поля поста, поэтому он читается из базы, а не
+    # из кэша, где счётчики могут отставать.
     post = get_object_or_404(Post, id=post_id)
     form = PostForm(request.POST or None,
                     files=request.FILES or None,
@@ -113,8 +184,9 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def delete_post(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = object_cache.posts.get_or_404(id=post_id)
     if post.author == request.user:
         post.delete()
     return redirect('posts:profile', request.user)
@@ -123,15 +195,18 @@ def delete_post(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    posts_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_group(request, posts_list)
-    context = {"page_obj": page_obj}
-    return render(request, template, context)
+    posts_list = feed.follow_feed(request.user)
+    page_obj = paginator_group(request, posts_list,
+                               field='feed_date', tiebreak='feed_post')
+    context = {"page_obj": page_obj,
+               "recommended": recommendations.for_user(request.user)}
+    return render_feed(request, template, context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = object_cache.users.get_or_404(username=username)
     user = request.user
     if author != user:
         Follow.objects.get_or_create(user=user, author=author)
@@ -139,6 +214,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     user = request.user
     Follow.objects.filter(user=user, author__username=username).delete()
@@ -0,0 +1,16 @@
+"""
+ASGI config for yatube project.
+
+Django 2.2 has no native ASGI support, so the WSGI application is served
+through core.asgi.WsgiToAsgi, e.g. ``uvicorn yatube.asgi:application``.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+from core.asgi import WsgiToAsgi
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+application = WsgiToAsgi(get_wsgi_application())
@@ -1,5 +1,7 @@
 import os
 
+from core.db.config import databases, replicas
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -36,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,12 +52,25 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+# Скомпилированные шаблоны хранятся в памяти процесса: правки шаблонов
+# видны только после перезапуска, поэтому при DEBUG кэш по умолчанию
+# выключен. Без DEBUG Django и сам оборачивает загрузчики в
+# cached.Loader; настройка делает выбор явным и позволяет включить кэш
+# при DEBUG.
+CACHED_TEMPLATES = os.environ.get('CACHED_TEMPLATES',
+                                  '0' if DEBUG else '1') == '1'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': ([('django.template.loaders.cached.Loader',
+                          TEMPLATE_LOADERS)]
+                        if CACHED_TEMPLATES else TEMPLATE_LOADERS),
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -67,17 +84,19 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Для ASGI-серверов: WSGI-приложение через адаптер core.asgi.
+ASGI_APPLICATION = 'yatube.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
-}
+# Базы, постоянные соединения и пул задаются переменными окружения
+# (DATABASE_URL и другие, см. core/db/config.py); без них — SQLite.
+DATABASES = databases(os.environ,
+                      'sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3'))
+DATABASE_REPLICAS = replicas(DATABASES)
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
 
 
 # Password validation
@@ -138,3 +157,77 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# Общий кэш для всех процессов: фрагменты постов считаются один раз
+# и сбрасываются сразу везде.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES['default'] = {
+        'BACKEND': 'core.redis_cache.RedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {'MAX_CONNECTIONS': 50, 'SOCKET_TIMEOUT': 1},
+    }
+
+# Авторы, у которых подписчиков больше, не раскладываются по лентам
+# при публикации: их посты подмешиваются в ленту при чтении.
+FEED_FANOUT_LIMIT = 10000
+
+# За сколько секунд вдвое падает вклад поста или комментария в оценку
+# популярности (posts.trending). После изменения — rebuild_trending.
+TRENDING_HALF_LIFE = 6 * 3600
+
+# Ленты отдаются по частям: шапка сразу, затем посты по мере рендера
+# (posts.streaming). response.context в тестах при этом недоступен.
+STREAMING_FEEDS = False
+
+# Потоков для генерации миниатюр; 0 — генерировать сразу при сохранении.
+POST_THUMBNAIL_WORKERS = 2
+
+# Фоновые задачи (core.jobs): лента, поиск, миниатюры, письма. Без
+# воркера они выполняются сразу в запросе; в проде JOBS_EAGER=0 и
+# задачи выполняет manage.py runworker.
+JOBS_EAGER = os.environ.get('JOBS_EAGER', '1') != '0'
+JOBS_MAX_ATTEMPTS = 5
+# Через сколько секунд задача упавшего воркера снова доступна.
+JOBS_LEASE = 300
+
+# Запрещённые слова и фразы для постов и комментариев. Большой список
+# удобнее держать в файле: по одному слову или фразе на строку.
+MODERATION_WORDS = ['Пушкин', 'Толстой']
+MODERATION_WORDS_FILE = None
+
+# Кэш версий для ответов 304 (posts.freshness). Должен быть общим для
+# всех процессов; с LocMemCache страницы всегда отдаются целиком.
+FRESHNESS_CACHE_ALIAS = 'default'
+
+# Кэш объектов (группы, авторы, посты): LRU в процессе перед общим кэшем
+# ALIAS. Копия в процессе может отставать от базы не дольше LOCAL_TIMEOUT
+# секунд. Кэш в памяти процесса (LocMemCache) вторым уровнем не служит.
+OBJECT_CACHE_ALIAS = 'default'
+OBJECT_CACHE_SIZE = 1000
+OBJECT_CACHE_LOCAL_TIMEOUT = 5
+OBJECT_CACHE_TIMEOUT = 300
+
+# Доля запросов, для которых пишется профиль (SQL, шаблоны, кэш) в
+# заголовок Server-Timing и лог core.profiling; 0 — не профилировать.
+PROFILING_SAMPLE_RATE = 0
+
+# Адреса, с которых доступен /metrics; None — без ограничений.
+# Проверяется REMOTE_ADDR: за nginx на той же машине любой запрос
+# приходит с 127.0.0.1, поэтому там /metrics нужно закрыть в самом
+# прокси или задать METRICS_TOKEN — тогда сборщик должен передавать
+# заголовок Authorization: Bearer <токен>.
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.profiling': {'handlers': ['console'], 'level': 'INFO',
+                           'propagate': False},
+    },
+}